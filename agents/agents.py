@@ -1,8 +1,11 @@
 import os
+import sys
+import importlib.util
 from autogen_ext.models.openai import AzureOpenAIChatCompletionClient
 from autogen_ext.tools.mcp import StdioServerParams, mcp_server_tools
 from autogen_agentchat.agents import AssistantAgent
 from dotenv import load_dotenv
+from utils.tracing import instrument_model_client, instrument_tools
 
 load_dotenv()
 
@@ -13,29 +16,108 @@ AZURE_DEPLOYMENT = os.getenv("AZURE_DEPLOYMENT")
 if not AZURE_API_KEY or not AZURE_API_ENDPOINT or not AZURE_DEPLOYMENT:
     raise ValueError("Azure API credentials are not set.")
 
+# How the bundled MCP servers are reached: "stdio" runs each in a separate
+# python process (a new one per tool call), "inprocess" mounts the FastMCP
+# servers in this process over an in-memory session
+MCP_TRANSPORT = os.getenv("MCP_TRANSPORT", "stdio").lower()
+MCP_SERVER_DIR = os.path.join(os.path.dirname(__file__), "..", "mcp")
+
+_inprocess_clients = {}
+
+
+_shared_model_client = None
+
 
 async def create_model_client():
     """Create Azure OpenAI model client"""
-    return AzureOpenAIChatCompletionClient(
+    return instrument_model_client(AzureOpenAIChatCompletionClient(
         api_key=AZURE_API_KEY,
         model="gpt-4o-2024-05-13",
         azure_deployment=AZURE_DEPLOYMENT,
         azure_endpoint=AZURE_API_ENDPOINT,
         api_version="2023-03-15-preview"
+    ))
+
+
+async def get_model_client():
+    """Model client shared by all agents (it holds the HTTP connection pool)"""
+    global _shared_model_client
+    if _shared_model_client is None:
+        _shared_model_client = await create_model_client()
+    return _shared_model_client
+
+
+def _load_server(filename: str):
+    """Import a bundled MCP server script and return its FastMCP instance"""
+    server_dir = os.path.abspath(MCP_SERVER_DIR)
+    # The scripts import their sibling helper modules as top-level modules
+    if server_dir not in sys.path:
+        sys.path.append(server_dir)
+    name = f"astra_mcp_{os.path.splitext(filename)[0]}"
+    spec = importlib.util.spec_from_file_location(name, os.path.join(server_dir, filename))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module.mcp
+
+
+async def _inprocess_session(filename: str):
+    """In-memory MCP client session to a bundled server, opened once per process"""
+    from fastmcp import Client
+
+    client = _inprocess_clients.get(filename)
+    if client is None:
+        client = Client(_load_server(filename))
+        await client.__aenter__()
+        _inprocess_clients[filename] = client
+    return client.session
+
+
+async def close_inprocess_servers():
+    """Close the in-memory sessions opened by the inprocess transport"""
+    while _inprocess_clients:
+        _, client = _inprocess_clients.popitem()
+        await client.__aexit__(None, None, None)
+
+
+async def load_server_tools(filename: str, transport: str = None):
+    """List a bundled MCP server's tools over the configured transport"""
+    server_path = os.path.join(MCP_SERVER_DIR, filename)
+    server_params = StdioServerParams(
+        # A new server process serves each tool call, so it must not hand
+        # out cursors or handles for later calls
+        command="python", args=[server_path], env={"MCP_SERVER_PER_CALL": "1"}
     )
 
+    transport = (transport or MCP_TRANSPORT).lower()
+    if transport == "inprocess":
+        tools = await mcp_server_tools(server_params, session=await _inprocess_session(filename))
+    elif transport == "stdio":
+        tools = await mcp_server_tools(server_params)
+    else:
+        raise ValueError(f"Unknown MCP transport '{transport}', expected 'stdio' or 'inprocess'")
+    return instrument_tools(tools)
+
+
+async def load_auth_tools():
+    """Start the auth MCP server and list its tools"""
+    return await load_server_tools("auth_tools.py")
+
 
-async def create_auth_agent():
+async def load_mongo_tools():
+    """Start the MongoDB MCP server and list its tools"""
+    return await load_server_tools("mongo_db.py")
+
+
+async def create_auth_agent(model_client=None, auth_tools=None):
     """Create authentication agent with only auth tools"""
     print("Initializing Authentication Agent...")
     
-    auth_server_path = os.path.join(os.path.dirname(__file__), "..", "mcp", "auth_tools.py")
-    auth_server = StdioServerParams(
-        command="python", args=[auth_server_path]
-    )
-    auth_tools = await mcp_server_tools(auth_server)
+    if auth_tools is None:
+        auth_tools = await load_auth_tools()
     
-    model_client = await create_model_client()
+    if model_client is None:
+        model_client = await get_model_client()
     
     return AssistantAgent(
         name="auth_agent",
@@ -53,17 +135,12 @@ async def create_auth_agent():
     )
 
 
-async def create_mcp_agent():
+async def create_mcp_agent(model_client=None, mongo_tools=None):
     """Create MCP agent with math and mongodb tools"""
     print("Initializing MCP Agent with all tools...")
 
-    mongo_server_path = os.path.join(os.path.dirname(__file__), "..", "mcp", "mongo_db.py")
-
-    mongo_server = StdioServerParams(
-        command="python", args=[mongo_server_path]
-    )
-
-    mongo_tools = await mcp_server_tools(mongo_server)
+    if mongo_tools is None:
+        mongo_tools = await load_mongo_tools()
     
     # Demo for SSE - rag browser
     # server_params = SseServerParams(
@@ -76,7 +153,8 @@ async def create_mcp_agent():
     #     "rag-web-browser",
     # )
     
-    model_client = await create_model_client()
+    if model_client is None:
+        model_client = await get_model_client()
     
     return AssistantAgent(
         name="mcp_agent",
@@ -0,0 +1,90 @@
+"""
+Compare the local embedding backend with Azure for tool routing.
+
+Azure's answers come from recorded vectors: the tool store
+(tool_embeddings.*.npy) and the routing prompts saved in the query
+embedding cache, so no network is needed. --live also times real Azure
+embedding calls for the same prompts.
+
+    python benchmarks/embedding_backends.py [--top-n 3] [--live]
+"""
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from embeddings.backends import AZURE_EMBEDDING_MODEL, AzureEmbeddingBackend, LocalHashingBackend
+from embeddings.query_cache import QueryEmbeddingCache
+from embeddings.store import load_store
+from embeddings.tools_embedding import EMBEDDING_STORE, EmbeddingRouter, ToolIndex
+from timing import percentile
+
+
+def latency_line(label, seconds):
+    ms = [s * 1000 for s in seconds]
+    return (
+        f"{label:8s} p50 {percentile(ms, 50):8.3f} ms   p95 {percentile(ms, 95):8.3f} ms"
+        f"   mean {statistics.mean(ms):8.3f} ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--top-n", type=int, default=3)
+    parser.add_argument("--live", action="store_true", help="also time live Azure embedding calls")
+    args = parser.parse_args()
+
+    try:
+        azure_store = load_store(EMBEDDING_STORE)
+    except FileNotFoundError:
+        sys.exit(f"No recorded Azure tool embeddings at {EMBEDDING_STORE}; run the agent once first")
+    azure_index = ToolIndex.from_store(azure_store)
+
+    recorded = list(QueryEmbeddingCache().recorded(AZURE_EMBEDDING_MODEL))
+    if not recorded:
+        sys.exit("No recorded routing prompts in the query embedding cache; run the agent once first")
+
+    local = EmbeddingRouter(backend=LocalHashingBackend()).load()
+
+    agree_top1 = agree_topn = 0
+    local_latency = []
+    disagreements = []
+    for text, azure_vector in recorded:
+        expected = azure_index.search(azure_vector, args.top_n)
+        start = time.perf_counter()
+        got = local.find_most_similar_tools(text, args.top_n)
+        local_latency.append(time.perf_counter() - start)
+
+        if got and got[0][0] == expected[0][0]:
+            agree_top1 += 1
+        else:
+            disagreements.append((text, expected[0][0], got[0][0] if got else None))
+        if expected[0][0] in [name for name, _ in got]:
+            agree_topn += 1
+
+    total = len(recorded)
+    print(f"\n{total} recorded prompts, {len(azure_index)} tools")
+    print(f"top-1 agreement with Azure:        {agree_top1 / total:6.1%}")
+    print(f"Azure top-1 within local top-{args.top_n}:   {agree_topn / total:6.1%}")
+    print(latency_line("local", local_latency))
+
+    if args.live:
+        azure = AzureEmbeddingBackend()
+        azure_latency = []
+        for text, _ in recorded:
+            start = time.perf_counter()
+            azure_index.search(azure.embed([text])[0], args.top_n)
+            azure_latency.append(time.perf_counter() - start)
+        print(latency_line("azure", azure_latency))
+
+    if disagreements:
+        print("\nDisagreements (prompt | azure | local):")
+        for text, expected, got in disagreements[:20]:
+            print(f"- {text} | {expected} | {got}")
+
+
+if __name__ == "__main__":
+    main()
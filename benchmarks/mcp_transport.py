@@ -0,0 +1,70 @@
+"""
+Per-call latency of a bundled MCP server over each transport.
+
+    python benchmarks/mcp_transport.py --calls 20
+    python benchmarks/mcp_transport.py --tool list_collections --args '{"database_name": "test"}'
+
+Needs the same .env as the agent (MONGO_URI for the MongoDB server).
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from autogen_core import CancellationToken
+from agents.agents import close_inprocess_servers, load_server_tools
+from timing import percentile
+
+
+async def measure(server: str, transport: str, tool_name: str, args: dict, calls: int) -> None:
+    start = time.perf_counter()
+    tools = await load_server_tools(server, transport)
+    startup = time.perf_counter() - start
+
+    tool = next((t for t in tools if t.name == tool_name), None)
+    if tool is None:
+        raise SystemExit(f"{server} has no tool named {tool_name}")
+
+    latencies, failures = [], 0
+    for _ in range(calls):
+        start = time.perf_counter()
+        try:
+            await tool.run_json(args, CancellationToken())
+        except Exception as e:
+            # e.g. the 5s MCP read timeout when a stdio server boots too slowly
+            failures += 1
+            print(f"{transport}: call failed after {time.perf_counter() - start:.1f}s: {type(e).__name__}")
+            continue
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    if not latencies:
+        print(f"{transport:10s} list tools {startup * 1000:8.1f} ms | all {calls} calls failed")
+        return
+    print(
+        f"{transport:10s} list tools {startup * 1000:8.1f} ms | per call p50 {percentile(latencies, 50):8.2f} ms"
+        f"  p95 {percentile(latencies, 95):8.2f} ms  mean {statistics.mean(latencies):8.2f} ms"
+        f"  ({len(latencies)} ok, {failures} failed)"
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--server", default="mongo_db.py")
+    parser.add_argument("--tool", default="list_databases")
+    parser.add_argument("--args", default="{}", help="tool arguments as JSON")
+    parser.add_argument("--calls", type=int, default=20)
+    options = parser.parse_args()
+
+    args = json.loads(options.args)
+    for transport in ("stdio", "inprocess"):
+        await measure(options.server, transport, options.tool, args, options.calls)
+    await close_inprocess_servers()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
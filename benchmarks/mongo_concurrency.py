@@ -0,0 +1,71 @@
+"""
+Shows that concurrent mongo_db.py tool calls overlap on the async driver.
+
+Each call runs a find whose filter sleeps server-side ($where + sleep), so
+N sequential calls take about N x delay while N concurrent calls should
+take about one delay. Needs a local mongod with server-side JavaScript
+enabled (the default):
+
+    MONGO_URI=mongodb://localhost:27017 python benchmarks/mongo_concurrency.py --calls 8
+"""
+import argparse
+import asyncio
+import importlib.util
+import json
+import sys
+import time
+from pathlib import Path
+
+SERVER_DIR = Path(__file__).parent.parent / "mcp"
+
+
+def load_mongo_server():
+    sys.path.append(str(SERVER_DIR))
+    spec = importlib.util.spec_from_file_location("astra_mcp_mongo_db", SERVER_DIR / "mongo_db.py")
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=8)
+    parser.add_argument("--delay-ms", type=int, default=200)
+    parser.add_argument("--database", default="astra_bench")
+    options = parser.parse_args()
+
+    from fastmcp import Client
+
+    server = load_mongo_server()
+    collection = server.get_mongo_client()[options.database]["concurrency"]
+    await collection.delete_many({})
+    await collection.insert_one({"probe": True})
+
+    arguments = {
+        "database_name": options.database,
+        "collection_name": "concurrency",
+        "filter_query": json.dumps({"$where": f"sleep({options.delay_ms}) || true"}),
+    }
+
+    async with Client(server.mcp) as client:
+        await client.call_tool("find_documents", arguments)  # connect + warm the pool
+
+        start = time.perf_counter()
+        for _ in range(options.calls):
+            await client.call_tool("find_documents", arguments)
+        sequential = time.perf_counter() - start
+
+        start = time.perf_counter()
+        await asyncio.gather(*(client.call_tool("find_documents", arguments) for _ in range(options.calls)))
+        concurrent = time.perf_counter() - start
+
+    await server.get_mongo_client().drop_database(options.database)
+
+    print(f"{options.calls} calls, {options.delay_ms} ms server-side each")
+    print(f"sequential {sequential * 1000:8.1f} ms")
+    print(f"concurrent {concurrent * 1000:8.1f} ms  ({sequential / concurrent:.1f}x overlap)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,279 @@
+"""
+Offline benchmark of the request pipeline, comparable across commits.
+
+Every remote dependency is replaced by a local stand-in (benchmarks/standins.py):
+recorded embedding vectors, a stub OPA server evaluating policies/policy.rego,
+a scripted model client and, if one is reachable at --mongo-uri, a local
+mongod. It runs
+
+  turns   run_mcp_agent-equivalent turns (routing, OPA authorization, agent
+          run with the scripted model and the MongoDB tools) --turns times,
+          --concurrency at a time
+  mongo   each MongoDB tool scenario against a seeded collection, --calls
+          times, --concurrency at a time (skipped without a mongod)
+
+and appends throughput, latency percentiles and per-span percentiles to
+--output as one JSON line tagged with the git commit. The previous run with
+the same settings from another commit is printed alongside for comparison.
+
+    python benchmarks/pipeline.py --turns 200 --concurrency 8
+    python benchmarks/pipeline.py --opa-latency-ms 2 --model-latency-ms 50 --embed-latency-ms 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+
+# Offline settings, before the pipeline modules read their configuration
+os.environ.setdefault("AZURE_KEY", "offline")
+os.environ.setdefault("AZURE_ENDPOINT", "http://127.0.0.1:9")
+os.environ.setdefault("AZURE_DEPLOYMENT", "offline")
+os.environ["OPA_MODE"] = "sidecar"
+os.environ["TRACE_FILE"] = ""
+os.environ["MCP_TRANSPORT"] = "inprocess"
+os.environ.setdefault("MONGO_SERVER_SELECTION_TIMEOUT_MS", "2000")
+
+from autogen_agentchat.agents import AssistantAgent
+from utils import opa, opa_client, runners
+from utils.opa_client import AsyncOPAClient
+from utils.tracing import instrument_model_client, span, tracer
+from embeddings.tools_embedding import EmbeddingRouter, tool_descriptions
+from standins import RecordedEmbeddingBackend, ScriptedModelClient, StubOPAServer, mongod_available, tool_call_script
+from timing import percentile
+
+DATABASE = "astra_bench"
+COLLECTION = "pipeline"
+PRINCIPAL = ("bench@example.com", "admin")
+
+# Prompts the turns cycle through, with the tool call the scripted model makes
+PROMPTS = [
+    ("How many documents are in the pipeline collection?", "count_documents", {}),
+    ("Show me a few documents from the pipeline collection", "find_documents", {"limit": 5}),
+    ("Find pipeline documents where status is active", "find_documents", {"filter_query": '{"status": "active"}'}),
+    ("Count documents by status in the pipeline collection", "aggregate",
+     {"pipeline": '[{"$group": {"_id": "$status", "n": {"$sum": 1}}}]'}),
+    ("List all collections in the astra_bench database", "list_collections", {}),
+    ("What databases exist?", "list_databases", {}),
+]
+
+# (name, tool, arguments) for the MongoDB tool scenarios
+MONGO_SCENARIOS = [
+    ("find_page", "find_documents", {"limit": 20}),
+    ("find_filtered", "find_documents", {"filter_query": '{"status": "active", "score": {"$gt": 50}}', "limit": 20}),
+    ("find_sorted", "find_documents", {"limit": 20, "sort": '{"score": -1}'}),
+    ("count_all", "count_documents", {}),
+    ("count_filtered", "count_documents", {"filter_query": '{"status": "active"}'}),
+    ("aggregate_group", "aggregate", {"pipeline": '[{"$group": {"_id": "$status", "avg": {"$avg": "$score"}}}]'}),
+]
+
+
+def scenario_result(latencies: list, errors: int, seconds: float) -> dict:
+    ms = [value * 1000 for value in latencies]
+    result = {"calls": len(latencies) + errors, "errors": errors, "seconds": round(seconds, 3)}
+    if ms:
+        result.update({
+            "throughput_rps": round(len(ms) / seconds, 2),
+            "p50_ms": round(percentile(ms, 50), 3),
+            "p95_ms": round(percentile(ms, 95), 3),
+            "p99_ms": round(percentile(ms, 99), 3),
+        })
+    return result
+
+
+async def run_concurrently(count: int, concurrency: int, call) -> dict:
+    """Run call(i) count times with at most concurrency in flight"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, errors = [], 0
+
+    async def one(i):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await call(i)
+            except Exception as e:
+                errors += 1
+                if errors <= 3:
+                    print(f"  call failed: {type(e).__name__}: {e}")
+                return
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(count)))
+    return scenario_result(latencies, errors, time.perf_counter() - start)
+
+
+async def seed(client, documents: int) -> None:
+    collection = client[DATABASE][COLLECTION]
+    await collection.drop()
+    statuses = ["active", "inactive", "pending"]
+    batch = [
+        {"name": f"item-{i}", "status": statuses[i % 3], "score": i % 100, "tags": ["a", "b", "c"][: i % 3 + 1]}
+        for i in range(documents)
+    ]
+    for start in range(0, len(batch), 5000):
+        await collection.insert_many(batch[start:start + 5000])
+
+
+def git_commit() -> str:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return "unknown"
+    return f"{commit}-dirty" if dirty else commit or "unknown"
+
+
+def previous_run(output: Path, config: dict, commit: str):
+    if not output.exists():
+        return None
+    match = None
+    for line in output.read_text(encoding="utf-8").splitlines():
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        if record.get("config") == config and record.get("commit") != commit:
+            match = record
+    return match
+
+
+def print_results(record: dict, baseline) -> None:
+    print(f"\ncommit {record['commit']}" + (f"  (vs {baseline['commit']})" if baseline else ""))
+    print(f"{'scenario':18s} {'calls':>6s} {'err':>4s} {'rps':>9s} {'p50 ms':>9s} {'p95 ms':>9s} {'p99 ms':>9s}")
+    for name, result in record["scenarios"].items():
+        line = (
+            f"{name:18s} {result['calls']:6d} {result['errors']:4d} {result.get('throughput_rps', 0):9.1f}"
+            f" {result.get('p50_ms', 0):9.2f} {result.get('p95_ms', 0):9.2f} {result.get('p99_ms', 0):9.2f}"
+        )
+        before = (baseline or {}).get("scenarios", {}).get(name)
+        if before and before.get("p50_ms") and result.get("p50_ms"):
+            line += f"   p50 {100 * (result['p50_ms'] / before['p50_ms'] - 1):+6.1f}%"
+            line += f"  rps {100 * (result['throughput_rps'] / before['throughput_rps'] - 1):+6.1f}%"
+        print(line)
+    print("\nspans (p50 / p95 / p99 ms):")
+    for name, row in record["spans"].items():
+        print(f"  {name:18s} {row['count']:6d}  {row.get('p50_ms', 0):9.2f} {row.get('p95_ms', 0):9.2f} {row.get('p99_ms', 0):9.2f}")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=100)
+    parser.add_argument("--calls", type=int, default=200, help="calls per MongoDB tool scenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--documents", type=int, default=20000, help="documents seeded into the bench collection")
+    parser.add_argument("--embed-latency-ms", type=float, default=0.0)
+    parser.add_argument("--opa-latency-ms", type=float, default=0.0)
+    parser.add_argument("--model-latency-ms", type=float, default=0.0)
+    parser.add_argument("--mongo-uri", default=os.getenv("MONGO_URI") or "mongodb://localhost:27017")
+    parser.add_argument("--skip", choices=["turns", "mongo"], action="append", default=[])
+    parser.add_argument("--output", default=str(ROOT / "benchmarks" / "results.jsonl"))
+    options = parser.parse_args()
+
+    os.environ["MONGO_URI"] = options.mongo_uri
+    has_mongo = await mongod_available(options.mongo_uri)
+    if not has_mongo:
+        print(f"No mongod at {options.mongo_uri}: MongoDB scenarios are skipped and turns make no tool calls")
+
+    opa_stub = await StubOPAServer(latency_ms=options.opa_latency_ms).start()
+    opa_client.opa_client = AsyncOPAClient(base_url=opa_stub.url)
+
+    prompts = [prompt for prompt, _, _ in PROMPTS]
+    backend = RecordedEmbeddingBackend.record(
+        list(tool_descriptions.values()) + prompts, latency_ms=options.embed_latency_ms
+    )
+    router = EmbeddingRouter(backend=backend, store_base=Path(tempfile.mkdtemp()) / "tool_embeddings")
+    await router.warm_up()
+    runners.tool_router = router
+
+    scenarios = {}
+    mongo_tools, server = [], None
+    if has_mongo:
+        from agents.agents import load_mongo_tools
+
+        mongo_tools = await load_mongo_tools()
+        server = sys.modules["astra_mcp_mongo_db"]
+        print(f"Seeding {options.documents} documents...")
+        await seed(server.get_mongo_client(), options.documents)
+
+    if "turns" not in options.skip:
+        async def turn(i):
+            prompt, tool, arguments = PROMPTS[i % len(PROMPTS)]
+            with span("turn"):
+                # The console loop's own routing and authorization step
+                reason = await runners.route_and_authorize(prompt, PRINCIPAL)
+                if reason:
+                    raise RuntimeError(reason)
+                if mongo_tools:
+                    args = {"database_name": DATABASE, "collection_name": COLLECTION, **arguments}
+                    if tool in ("list_databases",):
+                        args = {}
+                    elif tool == "list_collections":
+                        args = {"database_name": DATABASE}
+                    script = tool_call_script(tool, json.dumps(args))
+                else:
+                    script = ["Done."]
+                model_client = instrument_model_client(ScriptedModelClient(script, latency_ms=options.model_latency_ms))
+                agent = AssistantAgent(
+                    name="bench_agent", model_client=model_client, tools=mongo_tools, reflect_on_tool_use=True
+                )
+                with span("agent"):
+                    await agent.run(task=prompt)
+
+        # Start from a cold decision cache so OPA round trips are part of the measurement
+        opa.decision_cache.clear()
+        print(f"Running {options.turns} turns, {options.concurrency} at a time...")
+        scenarios["turn"] = await run_concurrently(options.turns, options.concurrency, turn)
+
+    if has_mongo and "mongo" not in options.skip:
+        from fastmcp import Client
+
+        async with Client(server.mcp) as client:
+            for name, tool, arguments in MONGO_SCENARIOS:
+                args = {"database_name": DATABASE, "collection_name": COLLECTION, **arguments}
+                print(f"Running {name}...")
+                scenarios[name] = await run_concurrently(
+                    options.calls, options.concurrency, lambda i, tool=tool, args=args: client.call_tool(tool, args)
+                )
+
+    if has_mongo:
+        from agents.agents import close_inprocess_servers
+
+        await server.get_mongo_client().drop_database(DATABASE)
+        await close_inprocess_servers()
+
+    await opa_stub.stop()
+    await opa_client.opa_client.close()
+
+    config = {
+        "turns": options.turns, "calls": options.calls, "concurrency": options.concurrency,
+        "documents": options.documents, "mongo": has_mongo,
+        "embed_latency_ms": options.embed_latency_ms, "opa_latency_ms": options.opa_latency_ms,
+        "model_latency_ms": options.model_latency_ms,
+    }
+    commit = git_commit()
+    record = {
+        "commit": commit,
+        "timestamp": time.time(),
+        "config": config,
+        "scenarios": scenarios,
+        "spans": tracer.metrics.summary(),
+    }
+    output = Path(options.output)
+    baseline = previous_run(output, config, commit)
+    with open(output, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record) + "\n")
+    print_results(record, baseline)
+    print(f"\nAppended to {output}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
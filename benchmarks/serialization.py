@@ -0,0 +1,114 @@
+"""
+BSON-to-JSON encoding of large nested documents, as find_documents returns them.
+
+Compares the old path (serialize_document rebuilding each document, then
+json.dumps with indent=2) with mongo_json.dumps on the stdlib and orjson
+backends. Runs without a database:
+
+    python benchmarks/serialization.py --documents 200 --depth 4 --runs 20
+
+The old path cannot encode datetime / Decimal128 / Binary at all, so it is
+timed on documents holding only ObjectIds and plain values.
+"""
+import argparse
+import datetime
+import json
+import statistics
+import sys
+import time
+import uuid
+from pathlib import Path
+from bson import Binary, Decimal128, ObjectId
+
+sys.path.append(str(Path(__file__).parent.parent / "mcp"))
+
+import mongo_json
+
+
+def legacy_serialize_document(doc):
+    """The original serialize_document from mcp/mongo_db.py"""
+    if doc is None:
+        return None
+    serialized = {}
+    for key, value in doc.items():
+        if isinstance(value, ObjectId):
+            serialized[key] = str(value)
+        elif isinstance(value, dict):
+            serialized[key] = legacy_serialize_document(value)
+        elif isinstance(value, list):
+            serialized[key] = [legacy_serialize_document(item) if isinstance(item, dict) else item for item in value]
+        else:
+            serialized[key] = value
+    return serialized
+
+
+def make_document(depth: int, width: int, rich: bool) -> dict:
+    doc = {
+        "_id": ObjectId(),
+        "name": "sensor-reading",
+        "value": 42.5,
+        "count": 17,
+        "tags": ["alpha", "beta", "gamma", "delta"],
+    }
+    if rich:
+        doc.update({
+            "created": datetime.datetime(2024, 5, 1, 12, 30, tzinfo=datetime.timezone.utc),
+            "price": Decimal128("19.99"),
+            "blob": Binary(b"\x00\x01\x02" * 8),
+            "uuid": uuid.uuid4(),
+        })
+    if depth > 0:
+        doc["children"] = [make_document(depth - 1, width, rich) for _ in range(width)]
+    return doc
+
+
+def time_runs(fn, runs: int) -> list:
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def report(label: str, timings: list, size: int) -> None:
+    print(f"{label:28s} median {statistics.median(timings):8.2f} ms   min {min(timings):8.2f} ms   {size / 1024:8.1f} KiB")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=200)
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--width", type=int, default=4)
+    parser.add_argument("--runs", type=int, default=20)
+    options = parser.parse_args()
+
+    def response(docs):
+        return {"database": "bench", "collection": "docs", "count": len(docs), "documents": docs}
+
+    plain = [make_document(options.depth, options.width, rich=False) for _ in range(options.documents)]
+    rich = [make_document(options.depth, options.width, rich=True) for _ in range(options.documents)]
+
+    def legacy():
+        return json.dumps(response([legacy_serialize_document(doc) for doc in plain]), indent=2)
+
+    def stdlib(docs):
+        mongo_json.USE_ORJSON = False
+        return mongo_json.dumps(response(docs), indent=0)
+
+    def fast(docs):
+        mongo_json.USE_ORJSON = True
+        return mongo_json.dumps(response(docs), indent=0)
+
+    print(f"{options.documents} documents, depth {options.depth}, width {options.width}\n")
+    report("legacy (plain, indent=2)", time_runs(legacy, options.runs), len(legacy()))
+    for label, docs in (("plain", plain), ("all BSON types", rich)):
+        report(f"json ({label})", time_runs(lambda: stdlib(docs), options.runs), len(stdlib(docs)))
+        if mongo_json.orjson is not None:
+            report(f"orjson ({label})", time_runs(lambda: fast(docs), options.runs), len(fast(docs)))
+    if mongo_json.orjson is None:
+        print("\norjson is not installed; pip install orjson to compare it")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Local stand-ins for the remote services of the request pipeline, used by
+benchmarks/pipeline.py: recorded embeddings, a stub OPA server, a scripted
+model client and a probe for a local mongod.
+"""
+import asyncio
+import time
+import uuid
+import numpy as np
+from autogen_core import FunctionCall
+from autogen_core.models import CreateResult, ModelFamily, ModelInfo, RequestUsage
+from autogen_ext.models.replay import ReplayChatCompletionClient
+from embeddings.backends import EmbeddingBackend, LocalHashingBackend
+from utils.policy import get_embedded_policy
+
+
+class RecordedEmbeddingBackend(EmbeddingBackend):
+    """
+    Replays recorded vectors instead of calling an embedding API, sleeping
+    latency_ms per request to stand in for the network. Texts that were
+    not recorded get a deterministic pseudo-random vector.
+    """
+
+    name = "recorded"
+    cacheable = False
+
+    def __init__(self, recordings: dict, model: str = "recorded", latency_ms: float = 0.0):
+        self.recordings = {text: np.asarray(vector, dtype=np.float32) for text, vector in recordings.items()}
+        self.dim = len(next(iter(self.recordings.values()))) if self.recordings else 256
+        self.model = model
+        self.latency_ms = latency_ms
+        self.misses = 0
+
+    @classmethod
+    def record(cls, texts, backend: EmbeddingBackend = None, latency_ms: float = 0.0):
+        """Record vectors for texts once, with the offline local backend by default"""
+        texts = list(dict.fromkeys(texts))
+        if backend is None:
+            backend = LocalHashingBackend()
+            backend.fit(texts)
+        vectors = backend.embed(texts)
+        return cls(dict(zip(texts, vectors)), model=f"recorded-{backend.model}", latency_ms=latency_ms)
+
+    def embed(self, texts, model=None):
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        rows = []
+        for text in texts:
+            vector = self.recordings.get(text)
+            if vector is None:
+                self.misses += 1
+                seed = int.from_bytes(uuid.uuid5(uuid.NAMESPACE_OID, text).bytes[:8], "little")
+                vector = np.random.default_rng(seed).standard_normal(self.dim).astype(np.float32)
+            rows.append(vector)
+        return np.vstack(rows) if rows else np.zeros((0, self.dim), dtype=np.float32)
+
+
+class StubOPAServer:
+    """
+    OPA's data API for mcp_tools/allow and mcp_tools/allowed_tools, answered
+    from policies/policy.rego by the embedded evaluator after latency_ms.
+    """
+
+    def __init__(self, latency_ms: float = 0.0, host: str = "127.0.0.1"):
+        self.latency_ms = latency_ms
+        self.host = host
+        self.port = None
+        self.requests = 0
+        self._runner = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self) -> "StubOPAServer":
+        from aiohttp import web
+
+        policy = get_embedded_policy()
+
+        async def evaluate(request):
+            self.requests += 1
+            if self.latency_ms:
+                await asyncio.sleep(self.latency_ms / 1000)
+            input_data = (await request.json()).get("input", {})
+            rule = request.match_info["rule"]
+            if rule == "allow":
+                return web.json_response({"result": policy.allow(input_data)})
+            if rule == "allowed_tools":
+                return web.json_response({"result": sorted(policy.allowed_tools(input_data))})
+            return web.json_response({})
+
+        app = web.Application()
+        app.router.add_post("/v1/data/mcp_tools/{rule}", evaluate)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, 0)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+
+class ScriptedModelClient(ReplayChatCompletionClient):
+    """Replays a fixed script of completions, taking latency_ms per call"""
+
+    def __init__(self, script, latency_ms: float = 0.0):
+        super().__init__(script, model_info=ModelInfo(
+            vision=False, function_calling=True, json_output=False,
+            family=ModelFamily.UNKNOWN, structured_output=False
+        ))
+        self.latency_ms = latency_ms
+
+    async def create(self, *args, **kwargs):
+        if self.latency_ms:
+            await asyncio.sleep(self.latency_ms / 1000)
+        return await super().create(*args, **kwargs)
+
+    async def create_stream(self, *args, **kwargs):
+        if self.latency_ms:
+            await asyncio.sleep(self.latency_ms / 1000)
+        async for item in super().create_stream(*args, **kwargs):
+            yield item
+
+
+def tool_call_script(tool: str, arguments: str, answer: str = "Done."):
+    """A tool call followed by the reflection answer, as AssistantAgent expects"""
+    call = CreateResult(
+        finish_reason="function_calls",
+        content=[FunctionCall(id=uuid.uuid4().hex[:8], arguments=arguments, name=tool)],
+        usage=RequestUsage(prompt_tokens=400, completion_tokens=30),
+        cached=False,
+    )
+    return [call, answer]
+
+
+async def mongod_available(uri: str, timeout_ms: int = 1000) -> bool:
+    from pymongo import AsyncMongoClient
+    from pymongo.errors import PyMongoError
+
+    client = AsyncMongoClient(uri, serverSelectionTimeoutMS=timeout_ms)
+    try:
+        await client.admin.command("ping")
+        return True
+    except PyMongoError:
+        return False
+    finally:
+        await client.close()
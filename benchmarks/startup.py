@@ -0,0 +1,80 @@
+"""
+Cold-start benchmark: time to import the modules main.py needs before the
+auth phase, each in a fresh interpreter.
+
+    python benchmarks/startup.py                 # current tree
+    python benchmarks/startup.py --ref HEAD~1    # also measure another commit
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+MODULES = ["embeddings.tools_embedding", "utils.runners"]
+
+SNIPPET = (
+    "import time; t = time.perf_counter(); import {module}; "
+    "print('ELAPSED', time.perf_counter() - t)"
+)
+
+
+def time_import(tree: Path, module: str, runs: int) -> list:
+    timings = []
+    env = {**os.environ, "PYTHONPATH": str(tree), "PYTHONDONTWRITEBYTECODE": "1"}
+    for _ in range(runs):
+        proc = subprocess.run(
+            [sys.executable, "-c", SNIPPET.format(module=module)],
+            cwd=tree, env=env, capture_output=True, text=True,
+        )
+        elapsed = [line for line in proc.stdout.splitlines() if line.startswith("ELAPSED")]
+        if proc.returncode != 0 or not elapsed:
+            error = (proc.stderr.strip().splitlines() or ["no output"])[-1]
+            raise RuntimeError(f"import {module} failed in {tree}: {error}")
+        timings.append(float(elapsed[-1].split()[1]))
+    return timings
+
+
+def report(label: str, tree: Path, runs: int) -> None:
+    print(f"\n{label} ({tree})")
+    for module in MODULES:
+        try:
+            timings = time_import(tree, module, runs)
+        except RuntimeError as e:
+            print(f"  {module:32s} FAILED: {e}")
+            continue
+        print(
+            f"  {module:32s} median {statistics.median(timings) * 1000:8.1f} ms"
+            f"   min {min(timings) * 1000:8.1f} ms   ({runs} runs)"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--ref", help="git revision to compare against")
+    args = parser.parse_args()
+
+    report("current tree", ROOT, args.runs)
+
+    if args.ref:
+        with tempfile.TemporaryDirectory() as tmp:
+            worktree = Path(tmp) / "ref"
+            subprocess.run(["git", "worktree", "add", "--detach", str(worktree), args.ref], cwd=ROOT, check=True, capture_output=True)
+            try:
+                # Share the local env/token/embedding files so both trees start from the same state
+                shared = [".env", "tools_embeddings.json", "tool_embeddings.npy", "tool_embeddings.manifest.json"]
+                shared += [path.name for path in ROOT.glob("tool_embeddings.*.npy")]
+                for name in shared:
+                    if (ROOT / name).exists():
+                        (worktree / name).symlink_to(ROOT / name)
+                report(args.ref, worktree, args.runs)
+            finally:
+                subprocess.run(["git", "worktree", "remove", "--force", str(worktree)], cwd=ROOT, capture_output=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,9 @@
+"""
+Latency statistics shared by the benchmarks.
+"""
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile (0-100) of a non-empty sequence"""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
@@ -0,0 +1,162 @@
+import asyncio
+import hashlib
+import math
+import os
+import re
+from collections import Counter
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "azure").lower()
+AZURE_EMBEDDING_MODEL = "text-embedding-ada-002"
+LOCAL_EMBEDDING_DIM = int(os.getenv("LOCAL_EMBEDDING_DIM", "2048"))
+
+
+class EmbeddingBackend:
+    """
+    Turns texts into vectors. `model` identifies the vector space: stores
+    and caches are keyed by it, so vectors from different backends never mix.
+    """
+
+    name = "base"
+    model = "base"
+    # Worth persisting query vectors for (remote backends)
+    cacheable = True
+
+    def embed(self, texts, model=None):
+        """Return one float32 row per text"""
+        raise NotImplementedError
+
+    async def aembed(self, texts, model=None):
+        return await asyncio.to_thread(self.embed, texts, model)
+
+    def fit(self, corpus) -> None:
+        """Adapt to the tool descriptions; a no-op for pretrained backends"""
+
+
+class AzureEmbeddingBackend(EmbeddingBackend):
+    name = "azure"
+    cacheable = True
+
+    def __init__(self, model=AZURE_EMBEDDING_MODEL):
+        # Imported here so selecting the local backend never loads the SDK
+        from openai import AzureOpenAI, AsyncAzureOpenAI
+
+        self.model = model
+        self.client = AzureOpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            api_version="2023-05-15",
+            azure_endpoint=os.getenv("AZURE_ENDPOINT_EMBEDDING"),
+        )
+        self.async_client = AsyncAzureOpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            api_version="2023-05-15",
+            azure_endpoint=os.getenv("AZURE_ENDPOINT_EMBEDDING"),
+        )
+
+    @staticmethod
+    def _to_matrix(response):
+        data = sorted(response.data, key=lambda item: item.index)
+        return np.array([item.embedding for item in data], dtype=np.float32)
+
+    def embed(self, texts, model=None):
+        response = self.client.embeddings.create(model=model or self.model, input=list(texts))
+        return self._to_matrix(response)
+
+    async def aembed(self, texts, model=None):
+        response = await self.async_client.embeddings.create(model=model or self.model, input=list(texts))
+        return self._to_matrix(response)
+
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def _features(text: str) -> list:
+    """Words, word bigrams and 3-5 character n-grams of each word"""
+    words = _TOKEN_RE.findall(text.lower())
+    features = list(words)
+    features += [f"{a} {b}" for a, b in zip(words, words[1:])]
+    for word in words:
+        padded = f" {word} "
+        for n in (3, 4, 5):
+            features += [f"#{padded[i:i + n]}" for i in range(len(padded) - n + 1)]
+    return features
+
+
+class LocalHashingBackend(EmbeddingBackend):
+    """
+    Offline TF-IDF over hashed word and character n-grams, computed with
+    NumPy. IDF weights are fitted on the tool descriptions, so the model id
+    includes a fingerprint of that corpus.
+    """
+
+    name = "local"
+    cacheable = False
+
+    def __init__(self, dim=LOCAL_EMBEDDING_DIM):
+        self.dim = dim
+        self.idf = {}
+        self.default_idf = 1.0
+        self.model = f"local-hash-{dim}"
+        self._slots = {}
+
+    def fit(self, corpus) -> None:
+        corpus = list(corpus)
+        document_frequency = Counter()
+        for text in corpus:
+            document_frequency.update(set(_features(text)))
+        n = len(corpus)
+        self.idf = {f: math.log((1 + n) / (1 + df)) + 1.0 for f, df in document_frequency.items()}
+        self.default_idf = math.log(1 + n) + 1.0
+        fingerprint = hashlib.sha256("\0".join(sorted(corpus)).encode("utf-8")).hexdigest()[:8]
+        self.model = f"local-hash-{self.dim}-{fingerprint}"
+
+    def _slot(self, feature: str):
+        slot = self._slots.get(feature)
+        if slot is None:
+            digest = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+            slot = (digest % self.dim, 1.0 if digest >> 63 else -1.0)
+            if len(self._slots) < 200_000:
+                self._slots[feature] = slot
+        return slot
+
+    def embed(self, texts, model=None):
+        texts = list(texts)
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            counts = Counter(_features(text))
+            if not counts:
+                continue
+            slots = [self._slot(f) for f in counts]
+            index = np.fromiter((s[0] for s in slots), dtype=np.intp, count=len(slots))
+            weights = np.fromiter(
+                (
+                    sign * (1.0 + math.log(count)) * self.idf.get(f, self.default_idf)
+                    for (f, count), (_, sign) in zip(counts.items(), slots)
+                ),
+                dtype=np.float32,
+                count=len(slots),
+            )
+            np.add.at(matrix[row], index, weights)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    async def aembed(self, texts, model=None):
+        return self.embed(texts, model)
+
+
+BACKENDS = {
+    "azure": AzureEmbeddingBackend,
+    "local": LocalHashingBackend,
+}
+
+
+def create_backend(name=None) -> EmbeddingBackend:
+    """Instantiate the backend named by `name` or the EMBEDDING_BACKEND setting"""
+    name = (name or EMBEDDING_BACKEND).lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend '{name}', expected one of {sorted(BACKENDS)}")
+    return BACKENDS[name]()
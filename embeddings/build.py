@@ -0,0 +1,101 @@
+import asyncio
+import os
+import numpy as np
+from dotenv import load_dotenv
+from embeddings.store import EmbeddingStore, description_hash, load_manifest, load_store, save_store
+
+load_dotenv()
+
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "16"))
+EMBEDDING_CONCURRENCY = int(os.getenv("EMBEDDING_CONCURRENCY", "4"))
+
+
+def stale_tools(descriptions: dict, manifest, model: str) -> list:
+    """Tools with no vector yet, or whose description or model changed"""
+    if manifest is None or manifest["model"] != model:
+        return list(descriptions)
+    hashes = manifest.get("description_hashes", {})
+    return [
+        name for name, description in descriptions.items()
+        if hashes.get(name) != description_hash(description)
+    ]
+
+
+async def _embed_batches(embed, names: list, descriptions: dict, model: str, batch_size: int, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    batches = [names[i:i + batch_size] for i in range(0, len(names), batch_size)]
+
+    async def run(batch):
+        async with semaphore:
+            try:
+                vectors = await embed([descriptions[name] for name in batch], model)
+            except Exception as e:
+                print(f"Error embedding {batch}: {e}")
+                return {}
+            return dict(zip(batch, vectors))
+
+    results = {}
+    for batch_result in await asyncio.gather(*(run(batch) for batch in batches)):
+        results.update(batch_result)
+    return results
+
+
+async def build_tool_embeddings(
+    descriptions: dict,
+    base,
+    embed,
+    model: str,
+    batch_size: int = EMBEDDING_BATCH_SIZE,
+    concurrency: int = EMBEDDING_CONCURRENCY,
+) -> EmbeddingStore:
+    """
+    Bring the store at `base` in line with `descriptions`.
+
+    Only tools whose description hash or model changed are re-embedded,
+    `batch_size` descriptions per request with up to `concurrency`
+    requests in flight; `embed(texts, model)` is an async callable
+    returning one vector per text. Tools no longer described are dropped.
+    """
+    try:
+        manifest = load_manifest(base)
+    except FileNotFoundError:
+        manifest = None
+
+    stale = stale_tools(descriptions, manifest, model)
+    removed = [] if manifest is None else [name for name in manifest["names"] if name not in descriptions]
+    store = None
+    if manifest is not None:
+        try:
+            if not stale and not removed:
+                return load_store(base)
+            # Read into memory: the old matrix is removed after the save below
+            store = load_store(base, mmap=False)
+        except (OSError, ValueError) as e:
+            # A matrix missing or not matching its manifest is rebuilt from scratch
+            print(f"Rebuilding embedding store: {e}")
+            stale = list(descriptions)
+    print(f"Embedding {len(stale)} tool descriptions in batches of {batch_size}")
+    fresh = await _embed_batches(embed, stale, descriptions, model, batch_size, concurrency)
+
+    old_rows = {} if store is None or store.model != model else dict(zip(store.names, store.matrix))
+    names, rows, hashes = [], [], {}
+    for name, description in descriptions.items():
+        if name in fresh:
+            names.append(name)
+            rows.append(np.asarray(fresh[name], dtype=np.float32))
+            hashes[name] = description_hash(description)
+        elif name in old_rows:
+            # Keep the previous vector; its old hash marks it stale for the next build
+            names.append(name)
+            rows.append(np.asarray(old_rows[name], dtype=np.float32))
+            if name in store.hashes:
+                hashes[name] = store.hashes[name]
+
+    matrix = np.stack(rows) if rows else np.zeros((0, 0), dtype=np.float32)
+    save_store(base, EmbeddingStore(names, matrix, model, hashes))
+    return load_store(base)
+
+
+def build_tool_embeddings_sync(*args, **kwargs) -> EmbeddingStore:
+    """build_tool_embeddings for callers outside an event loop"""
+    return asyncio.run(build_tool_embeddings(*args, **kwargs))
@@ -0,0 +1,155 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+import numpy as np
+from dotenv import load_dotenv
+from utils.cache import TTLCache
+
+load_dotenv()
+
+QUERY_CACHE_PATH = os.getenv(
+    "QUERY_CACHE_PATH", str(Path(__file__).parent.parent / ".query_embeddings.sqlite3")
+)
+QUERY_CACHE_MEMORY_SIZE = int(os.getenv("QUERY_CACHE_MEMORY_SIZE", "512"))
+QUERY_CACHE_MAX_ROWS = int(os.getenv("QUERY_CACHE_MAX_ROWS", "50000"))
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", str(30 * 24 * 3600)))
+
+
+def normalize_query(text: str) -> str:
+    """Case- and whitespace-insensitive form used as the cache key"""
+    return " ".join(text.lower().split())
+
+
+class QueryEmbeddingCache:
+    """
+    Two-tier cache of query embeddings keyed by (model, normalized text):
+    an in-memory LRU in front of a SQLite table that survives restarts.
+    An empty path keeps the cache memory-only.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = QUERY_CACHE_PATH,
+        memory_size: int = QUERY_CACHE_MEMORY_SIZE,
+        max_rows: int = QUERY_CACHE_MAX_ROWS,
+        ttl: float = QUERY_CACHE_TTL,
+    ):
+        self.memory = TTLCache(maxsize=memory_size, ttl=ttl)
+        self.max_rows = max_rows
+        self.ttl = ttl
+        self.disk_hits = 0
+        self.disk_misses = 0
+        self.disk_evictions = 0
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS query_embeddings ("
+                " key TEXT PRIMARY KEY, model TEXT NOT NULL, text TEXT NOT NULL,"
+                " dim INTEGER NOT NULL, vector BLOB NOT NULL,"
+                " created_at REAL NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS query_embeddings_last_used ON query_embeddings(last_used)"
+            )
+            self._db.commit()
+
+    @staticmethod
+    def make_key(text: str, model: str) -> str:
+        return hashlib.sha256(f"{model}\0{normalize_query(text)}".encode("utf-8")).hexdigest()
+
+    def get(self, text: str, model: str):
+        key = self.make_key(text, model)
+        vector = self.memory.get(key)
+        if vector is not None or self._db is None:
+            return vector
+
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT vector, created_at FROM query_embeddings WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or row[1] + self.ttl <= now:
+                if row is not None:
+                    self._db.execute("DELETE FROM query_embeddings WHERE key = ?", (key,))
+                    self._db.commit()
+                    self.disk_evictions += 1
+                self.disk_misses += 1
+                return None
+            self._db.execute("UPDATE query_embeddings SET last_used = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            self.disk_hits += 1
+
+        vector = np.frombuffer(row[0], dtype=np.float32)
+        self.memory.set(key, vector, ttl=row[1] + self.ttl - now)
+        return vector
+
+    def set(self, text: str, model: str, vector) -> None:
+        key = self.make_key(text, model)
+        vector = np.asarray(vector, dtype=np.float32)
+        self.memory.set(key, vector)
+        if self._db is None:
+            return
+
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO query_embeddings VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, model, normalize_query(text), int(vector.shape[0]), vector.tobytes(), now, now),
+            )
+            self._prune(now)
+            self._db.commit()
+
+    def _prune(self, now: float) -> None:
+        expired = self._db.execute(
+            "DELETE FROM query_embeddings WHERE created_at <= ?", (now - self.ttl,)
+        ).rowcount
+        overflow = self._db.execute(
+            "DELETE FROM query_embeddings WHERE key IN ("
+            " SELECT key FROM query_embeddings ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+            (self.max_rows,),
+        ).rowcount
+        self.disk_evictions += expired + overflow
+
+    def recorded(self, model: str):
+        """Yield (normalized text, vector) for every stored query of a model"""
+        if self._db is None:
+            return
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT text, vector FROM query_embeddings WHERE model = ?", (model,)
+            ).fetchall()
+        for text, blob in rows:
+            yield text, np.frombuffer(blob, dtype=np.float32)
+
+    def clear(self) -> None:
+        self.memory.clear()
+        if self._db is not None:
+            with self._lock:
+                self._db.execute("DELETE FROM query_embeddings")
+                self._db.commit()
+
+    def stats(self) -> dict:
+        stats = {"memory": self.memory.stats()}
+        if self._db is not None:
+            with self._lock:
+                rows = self._db.execute("SELECT COUNT(*) FROM query_embeddings").fetchone()[0]
+            stats["disk"] = {
+                "rows": rows,
+                "max_rows": self.max_rows,
+                "hits": self.disk_hits,
+                "misses": self.disk_misses,
+                "evictions": self.disk_evictions,
+            }
+        return stats
+
+    def close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
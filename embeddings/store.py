@@ -0,0 +1,154 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+import numpy as np
+
+STORE_VERSION = 1
+
+# Matrix files replaced by a newer save are removed once they are this old,
+# so a concurrent writer's not-yet-committed matrix is left alone
+STALE_MATRIX_AGE = 300
+
+
+def description_hash(description: str) -> str:
+    return hashlib.sha256(description.encode("utf-8")).hexdigest()[:16]
+
+
+def _normalize(matrix):
+    matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+    if matrix.size == 0:
+        return matrix
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class EmbeddingStore:
+    """
+    Tool embeddings on disk as a float32 .npy matrix (rows L2-normalized)
+    plus a JSON manifest with tool names, model, dimension, the hash of
+    each description the vectors were computed from and the name of the
+    matrix file. Each save writes its matrix under a new content-derived
+    name, so replacing the manifest switches both files at once.
+    """
+
+    def __init__(self, names, matrix, model, hashes=None):
+        self.names = list(names)
+        self.matrix = matrix
+        self.model = model
+        self.hashes = dict(hashes or {})
+
+    @property
+    def dimension(self) -> int:
+        return int(self.matrix.shape[1]) if self.matrix.ndim == 2 else 0
+
+    def as_dict(self) -> dict:
+        """{tool: vector} view over the matrix rows (no copy)"""
+        return dict(zip(self.names, self.matrix))
+
+
+def store_paths(base):
+    """
+    Default matrix and manifest paths for a store base path like
+    .../tool_embeddings (saved stores name their matrix in the manifest)
+    """
+    base = Path(base)
+    return base.with_suffix(".npy"), base.with_suffix(".manifest.json")
+
+
+def _atomic_write(path: Path, write) -> None:
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def _matrix_name(base: Path, matrix, names) -> str:
+    digest = hashlib.sha256()
+    digest.update(json.dumps(names).encode("utf-8"))
+    digest.update(matrix.tobytes())
+    return f"{base.name}.{digest.hexdigest()[:16]}.npy"
+
+
+def _remove_stale_matrices(base: Path, current: str) -> None:
+    cutoff = time.time() - STALE_MATRIX_AGE
+    for path in [base.with_suffix(".npy"), *base.parent.glob(f"{base.name}.*.npy")]:
+        try:
+            if path.name != current and path.stat().st_mtime < cutoff:
+                path.unlink()
+        except OSError:
+            # Gone already, or still open elsewhere (Windows)
+            pass
+
+
+def save_store(base, store: EmbeddingStore) -> None:
+    """Write the matrix under a unique name, then the manifest pointing at it (the commit point)"""
+    base = Path(base)
+    _, manifest_path = store_paths(base)
+    matrix = _normalize(store.matrix)
+    matrix_path = base.with_name(_matrix_name(base, matrix, store.names))
+    manifest = {
+        "version": STORE_VERSION,
+        "model": store.model,
+        "dimension": int(matrix.shape[1]) if matrix.size else 0,
+        "dtype": "float32",
+        "names": store.names,
+        "description_hashes": store.hashes,
+        "matrix_file": matrix_path.name,
+    }
+    _atomic_write(matrix_path, lambda f: np.save(f, matrix, allow_pickle=False))
+    _atomic_write(manifest_path, lambda f: f.write(json.dumps(manifest, indent=2).encode("utf-8")))
+    _remove_stale_matrices(base, matrix_path.name)
+    print(f"Successfully saved {len(store.names)} embeddings to {matrix_path}")
+
+
+def load_manifest(base) -> dict:
+    """Read only the manifest; raises FileNotFoundError if the store does not exist"""
+    _, manifest_path = store_paths(base)
+    manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+    if manifest.get("version") != STORE_VERSION:
+        raise ValueError(f"Unsupported embedding store version: {manifest.get('version')}")
+    return manifest
+
+
+def load_store(base, mmap: bool = True) -> EmbeddingStore:
+    """Memory-map a saved store; raises FileNotFoundError if it does not exist"""
+    default_matrix_path, _ = store_paths(base)
+    manifest = load_manifest(base)
+    matrix_path = default_matrix_path.with_name(manifest.get("matrix_file") or default_matrix_path.name)
+
+    matrix = np.load(matrix_path, mmap_mode="r" if mmap else None, allow_pickle=False)
+    names = manifest["names"]
+    if matrix.shape[0] != len(names) or (names and matrix.shape[1] != manifest["dimension"]):
+        raise ValueError(f"Embedding store {matrix_path} does not match its manifest")
+
+    print(f"Loaded {len(names)} embeddings from {matrix_path}")
+    return EmbeddingStore(names, matrix, manifest["model"], manifest.get("description_hashes"))
+
+
+def migrate_json(json_path, base, model, descriptions=None) -> EmbeddingStore:
+    """Convert a legacy {tool: [floats]} JSON file into a binary store"""
+    with open(json_path, "r", encoding="utf-8") as f:
+        json_embeddings = json.load(f)
+
+    names = list(json_embeddings)
+    matrix = np.array([json_embeddings[name] for name in names], dtype=np.float32)
+    # Vectors of tools whose description is unknown get no hash, so they are rebuilt
+    hashes = {
+        name: description_hash(descriptions[name])
+        for name in names if descriptions and name in descriptions
+    }
+    store = EmbeddingStore(names, matrix, model, hashes)
+    save_store(base, store)
+    print(f"Migrated embeddings from {json_path}")
+    return load_store(base)
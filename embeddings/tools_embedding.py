@@ -1,19 +1,91 @@
 import os
 import json
+import asyncio
+import threading
 from pathlib import Path
-from openai import AzureOpenAI
 from dotenv import load_dotenv
 import numpy as np
+from embeddings.store import migrate_json, store_paths
+from embeddings.build import build_tool_embeddings_sync
+from embeddings.query_cache import QueryEmbeddingCache
+from embeddings.backends import AZURE_EMBEDDING_MODEL, create_backend
+from utils.tracing import span
 
 load_dotenv()
 
+EMBEDDING_MODEL = AZURE_EMBEDDING_MODEL
+
+
+class ToolIndex:
+    """
+    Tool embeddings as one contiguous, L2-normalized float32 matrix with a
+    parallel list of tool names, so scoring is a single matrix product.
+    """
+
+    def __init__(self, names, matrix, normalized=False):
+        self.names = list(names)
+        matrix = np.asarray(matrix, dtype=np.float32)
+        if normalized:
+            # Already unit rows (e.g. a memory-mapped store): use without copying
+            self.matrix = matrix
+            return
+        matrix = np.ascontiguousarray(matrix)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        self.matrix = matrix / norms
+
+    @classmethod
+    def from_store(cls, store):
+        return cls(store.names, store.matrix, normalized=True)
+
+    @classmethod
+    def from_dict(cls, embedding_dict):
+        names = list(embedding_dict)
+        if not names:
+            return cls([], np.zeros((0, 0), dtype=np.float32))
+        return cls(names, np.stack([np.asarray(embedding_dict[name], dtype=np.float32) for name in names]))
+
+    def __len__(self):
+        return len(self.names)
+
+    def _top_k(self, scores, top_n):
+        k = min(top_n, scores.shape[-1])
+        if k <= 0:
+            return np.empty(scores.shape[:-1] + (0,), dtype=np.intp)
+        if k < scores.shape[-1]:
+            idx = np.argpartition(-scores, k - 1, axis=-1)[..., :k]
+        else:
+            idx = np.broadcast_to(np.arange(k), scores.shape[:-1] + (k,))
+        order = np.argsort(-np.take_along_axis(scores, idx, axis=-1), axis=-1)
+        return np.take_along_axis(idx, order, axis=-1)
+
+    def search(self, query_vector, top_n=1):
+        """Return [(tool_name, cosine_similarity)] for the top_n tools"""
+        return self.search_batch(np.asarray(query_vector)[None, :], top_n)[0]
+
+    def search_batch(self, query_matrix, top_n=1):
+        """Score many queries at once; returns one result list per query row"""
+        queries = np.asarray(query_matrix, dtype=np.float32)
+        if len(self.names) == 0:
+            return [[] for _ in range(len(queries))]
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        scores = (queries / norms) @ self.matrix.T
+        top = self._top_k(scores, top_n)
+        return [
+            [(self.names[i], float(row_scores[i])) for i in row_top]
+            for row_scores, row_top in zip(scores, top)
+        ]
+
+
 class LLM_Embeddings:
-    def __init__(self):
-        self.client = AzureOpenAI(
-            api_key=os.getenv("OPENAI_API_KEY"),
-            api_version="2023-05-15",
-            azure_endpoint=os.getenv("AZURE_ENDPOINT_EMBEDDING"),
-        )
+    def __init__(self, backend=None):
+        self.backend = backend or create_backend()
+        self.client = getattr(self.backend, "client", None)
+        # Local backends embed faster than a cache lookup, so only remote ones are cached
+        self.query_cache = QueryEmbeddingCache() if self.backend.cacheable else None
+        self._index = None
+        self._index_source = None
 
 
     def save_embeddings(self, embeddings, filename):
@@ -43,65 +115,198 @@ class LLM_Embeddings:
             raise
 
     def get_openai_embedding(
-        self, text, model = "text-embedding-ada-002"
+        self, text, model = None
     ):
-        response = self.client.embeddings.create(
-            model=model,
-            input=text,
-        )
-        embedding_vector = np.array(response.data[0].embedding)
-        return embedding_vector
+        """Embed one text with the configured backend (Azure OpenAI by default)"""
+        return self.backend.embed([text], model)[0]
 
+    def get_openai_embeddings(
+        self, texts, model = None
+    ):
+        """Embed several texts in one request, returned as rows of a float32 matrix"""
+        return self.backend.embed(list(texts), model)
+
+    async def aget_openai_embeddings(
+        self, texts, model = None
+    ):
+        """Async get_openai_embeddings, used to build tool embeddings concurrently"""
+        return await self.backend.aembed(list(texts), model)
+
+    def embed_query(self, text, model = None):
+        """Embedding for a routing prompt, served from the query cache when possible"""
+        model = model or self.backend.model
+        if self.query_cache is None:
+            return self.get_openai_embedding(text, model)
+        vector = self.query_cache.get(text, model)
+        if vector is None:
+            vector = self.get_openai_embedding(text, model)
+            self.query_cache.set(text, model, vector)
+        return vector
+
+    def embed_queries(self, texts, model = None):
+        """embed_query for many prompts; only cache misses are sent, in one request"""
+        model = model or self.backend.model
+        texts = list(texts)
+        if self.query_cache is None:
+            return self.get_openai_embeddings(texts, model)
+        vectors = [self.query_cache.get(text, model) for text in texts]
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            fresh = self.get_openai_embeddings([texts[i] for i in missing], model)
+            for i, vector in zip(missing, fresh):
+                self.query_cache.set(texts[i], model, vector)
+                vectors[i] = vector
+        return np.stack([np.asarray(vector, dtype=np.float32) for vector in vectors])
 
     def cosine_similarity(self, a, b):
         return np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b))
     
+    def get_index(self, embeddings):
+        """Return a ToolIndex for a ToolIndex or {tool: vector} dict, reusing the last one built"""
+        if isinstance(embeddings, ToolIndex):
+            return embeddings
+        if self._index_source is not embeddings or len(self._index) != len(embeddings):
+            self._index = ToolIndex.from_dict(embeddings)
+            self._index_source = embeddings
+        return self._index
+
     def find_most_similar_tools(
         self, query, embedding_dict, top_n = 1
     ):
+        with span("routing", backend=self.backend.name):
+            try:
+                with span("routing.embed"):
+                    query_vector = self.embed_query(query)
+            except (ConnectionError, ValueError) as e:
+                print("Error generating embedding for query:", str(e))
+                return []
+
+            return self.get_index(embedding_dict).search(query_vector, top_n)
+
+    def find_most_similar_tools_batch(
+        self, queries, embedding_dict, top_n = 1
+    ):
+        """find_most_similar_tools for many queries with one embedding request"""
+        queries = list(queries)
+        if not queries:
+            return []
         try:
-            query_vector = self.get_openai_embedding(query)
+            query_matrix = self.embed_queries(queries)
         except (ConnectionError, ValueError) as e:
-            print("Error generating embedding for query:", str(e))
-            return []
-
-        similarities = {}
-        for tool_name, vector in embedding_dict.items():
-            similarity = self.cosine_similarity(query_vector, vector)
-            similarities[tool_name] = similarity
+            print("Error generating embeddings for queries:", str(e))
+            return [[] for _ in queries]
 
-        sorted_tools = sorted(
-            similarities.items(), key=lambda item: item[1], reverse=True
-        )
-        return sorted_tools[:top_n]
+        return self.get_index(embedding_dict).search_batch(query_matrix, top_n)
     
 tool_descriptions = {
     "list_databases": "List all databases in MongoDB instance.",
     "list_collections": "List all collections in a specific database.",
     "find_documents": "Find documents in a collection.",
+    "stream_documents": "Export documents from a collection to an NDJSON file.",
     "insert_document": "Insert a new document into a collection.",
     "insert_many_documents": "Insert multiple documents into a collection.",
     "update_document": "Update a single document in a collection.",
     "update_many_documents": "Update multiple documents in a collection.",
     "delete_document": "Delete a single document from a collection.",
     "delete_many_documents": "Delete multiple documents from a collection.",
+    "bulk_write": "Run many insert, update, replace and delete operations in chunks, from NDJSON or a file.",
+    "fetch_more": "Fetch the remaining documents of a truncated query result using its continuation handle.",
     "count_documents": "Count documents in a collection.",
+    "collection_stats": "Show a collection's size, document count, average document size and indexes.",
+    "aggregate": "Run an aggregation pipeline to group, summarize or compute statistics over a collection, or explain it.",
+    "slow_queries": "Show recent slow queries and whether they scanned the whole collection.",
+    "suggest_indexes": "Recommend indexes for a collection based on recent query patterns.",
+    "list_indexes": "List the indexes of a collection.",
+    "create_index": "Create an index on one or more fields of a collection.",
     "create_collection": "Create a new collection in a database.",
     "drop_collection": "Drop (delete) a collection from a database."
 }
 
-EMBEDDING_FILE = TOKEN_FILE = Path(__file__).parent.parent / "tools_embeddings.json"
+EMBEDDING_FILE = Path(__file__).parent.parent / "tools_embeddings.json"
+EMBEDDING_STORE = Path(__file__).parent.parent / "tool_embeddings"
 
-try:
-    llm_embeddings = LLM_Embeddings()
-    global_tool_embeddings = llm_embeddings.load_embeddings(EMBEDDING_FILE)
-except FileNotFoundError:
-    global_tool_embeddings = {}
-    for tool_name, description in tool_descriptions.items():
-        try:
-            embedding_result = llm_embeddings.get_openai_embedding(description)
-            global_tool_embeddings[tool_name] = embedding_result
-        except (ConnectionError, ValueError) as e:
-            print("Error :", str(e))
-    llm_embeddings.save_embeddings(global_tool_embeddings, EMBEDDING_FILE)
-    print(f"Generated and saved new embeddings to  {EMBEDDING_FILE}")
\ No newline at end of file
+
+
+class EmbeddingRouter:
+    """
+    Routes prompts to tools by embedding similarity.
+
+    Nothing happens at construction: the embedding backend, the store and
+    the index are set up by load(), which runs on first use or ahead of
+    time via warm_up()/start_warm_up() while the user is still logging in.
+    """
+
+    def __init__(self, descriptions=None, backend=None, store_base=None, legacy_file=EMBEDDING_FILE):
+        self.descriptions = tool_descriptions if descriptions is None else descriptions
+        self.backend = backend
+        self.store_base = store_base
+        self.legacy_file = legacy_file
+        self.embeddings = None
+        self.store = None
+        self.index = None
+        self._lock = threading.Lock()
+        self._warm_task = None
+
+    @property
+    def ready(self) -> bool:
+        return self.index is not None
+
+    def load(self) -> "EmbeddingRouter":
+        """Create the backend and bring the tool index up to date (idempotent)"""
+        with self._lock:
+            if self.index is not None:
+                return self
+            backend = self.backend or create_backend()
+            backend.fit(self.descriptions.values())
+            embeddings = LLM_Embeddings(backend)
+
+            # Each backend keeps its own store; the legacy JSON file holds Azure vectors
+            store_base = self.store_base
+            if store_base is None:
+                store_base = EMBEDDING_STORE if backend.name == "azure" else EMBEDDING_STORE.with_name(f"tool_embeddings_{backend.name}")
+            if backend.name == "azure" and not store_paths(store_base)[1].exists() and Path(self.legacy_file).exists():
+                migrate_json(self.legacy_file, store_base, backend.model, self.descriptions)
+
+            # Re-embeds only new or changed descriptions; just loads the store when it is current
+            store = build_tool_embeddings_sync(
+                self.descriptions, store_base, embeddings.aget_openai_embeddings, backend.model
+            )
+            self.backend = backend
+            self.embeddings = embeddings
+            self.store = store
+            self.index = ToolIndex.from_store(store)
+            return self
+
+    async def warm_up(self) -> "EmbeddingRouter":
+        """load() in a worker thread so the event loop keeps running"""
+        task = self._warm_task
+        if task is not None and not task.done():
+            try:
+                await asyncio.shield(task)
+            except Exception:
+                pass  # retried below
+        if self.ready:
+            return self
+        return await asyncio.to_thread(self.load)
+
+    def start_warm_up(self) -> asyncio.Task:
+        """Schedule warm_up() in the background and return its task"""
+        if self._warm_task is None:
+            self._warm_task = asyncio.get_running_loop().create_task(asyncio.to_thread(self.load))
+        return self._warm_task
+
+    def find_most_similar_tools(self, query, top_n=1):
+        self.load()
+        return self.embeddings.find_most_similar_tools(query, self.index, top_n)
+
+    def find_most_similar_tools_batch(self, queries, top_n=1):
+        self.load()
+        return self.embeddings.find_most_similar_tools_batch(queries, self.index, top_n)
+
+    async def route(self, query, top_n=1):
+        """find_most_similar_tools without blocking the event loop"""
+        await self.warm_up()
+        return await asyncio.to_thread(self.embeddings.find_most_similar_tools, query, self.index, top_n)
+
+
+tool_router = EmbeddingRouter()
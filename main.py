@@ -1,27 +1,44 @@
 import asyncio
-from agents.agents import create_auth_agent, create_mcp_agent
+import sys
 from utils.runners import run_auth_agent, run_mcp_agent
 from utils.check import is_authenticated
+from utils.startup import Startup
+from embeddings.tools_embedding import tool_router
 
 async def main() -> None:
     """Main execution flow with three-phase system"""
+
+    # Model client, MongoDB tool listing and tool router warm up in the
+    # background while the user authenticates
+    startup = Startup(router=tool_router)
+    startup.start()
     
     # --- Phase 1: Authentication ---
-    if is_authenticated():
+    with startup.timer.phase("auth_check"):
+        already_authenticated = await asyncio.to_thread(is_authenticated)
+
+    if already_authenticated:
         print("Already authenticated. Skipping to tool detection phase...")
         auth_successful = True
     else:
-        auth_agent = await create_auth_agent()
-        auth_successful = await run_auth_agent(auth_agent)
+        auth_agent = await startup.auth_agent()
+        with startup.timer.phase("user_auth"):
+            auth_successful = await run_auth_agent(auth_agent)
     
     if not auth_successful:
         print("Authentication failed or cancelled. Exiting.")
         return
     
     # --- Phase 2: MCP Agent with integrated tool detection & OPA ---
-    mcp_agent = await create_mcp_agent()
+    mcp_agent = await startup.mcp_agent()
+    startup.timer.report()
 
     await run_mcp_agent(mcp_agent)
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    if "--gateway" in sys.argv[1:]:
+        # Multi-user HTTP front end instead of the interactive prompt
+        from utils.gateway import run_gateway
+        asyncio.run(run_gateway())
+    else:
+        asyncio.run(main())
\ No newline at end of file
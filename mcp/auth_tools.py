@@ -98,7 +98,10 @@ async def complete_auth(authorization_code: str) -> str:
         flow.fetch_token(code=authorization_code)
         creds = flow.credentials
 
-        TOKEN_FILE.write_text(creds.to_json())
+        # id_token is not part of to_json(); keep it for local verification
+        token_data = json.loads(creds.to_json())
+        token_data["id_token"] = creds.id_token
+        TOKEN_FILE.write_text(json.dumps(token_data))
 
         return "Authentication successful! Credentials saved."
     except Exception as e:
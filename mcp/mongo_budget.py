@@ -0,0 +1,188 @@
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+from mongo_json import dumps
+
+load_dotenv()
+
+# Default token budget per tool response, and per-tool overrides as
+# "tool=tokens,tool=tokens" (0 disables budgeting for that tool)
+TOOL_TOKEN_BUDGET = int(os.getenv("TOOL_TOKEN_BUDGET", "4000"))
+TOOL_TOKEN_BUDGETS = os.getenv("TOOL_TOKEN_BUDGETS", "")
+TOOL_TOKEN_ENCODING = os.getenv("TOOL_TOKEN_ENCODING", "o200k_base")
+# Trimming applied to documents once a response is over budget
+TOOL_FIELD_MAX_CHARS = int(os.getenv("TOOL_FIELD_MAX_CHARS", "300"))
+TOOL_ARRAY_MAX_ITEMS = int(os.getenv("TOOL_ARRAY_MAX_ITEMS", "10"))
+# How long the omitted documents wait for fetch_more
+TOOL_OVERFLOW_TTL = float(os.getenv("TOOL_OVERFLOW_TTL", "600"))
+
+# Room left for the response envelope around the documents
+ENVELOPE_TOKENS = 100
+
+
+def parse_budgets(spec: str) -> Dict[str, int]:
+    budgets = {}
+    for item in spec.split(","):
+        if "=" in item:
+            tool, tokens = item.split("=", 1)
+            budgets[tool.strip()] = int(tokens)
+    return budgets
+
+
+class TokenCounter:
+    """
+    tiktoken counts, loaded on first use. When the encoding cannot be
+    loaded (it is downloaded once, so e.g. offline) counts fall back to an
+    estimate of 4 characters per token.
+    """
+
+    def __init__(self, encoding_name: str = TOOL_TOKEN_ENCODING):
+        self.encoding_name = encoding_name
+        self._encoding = None
+        self._loaded = False
+
+    def count(self, text: str) -> int:
+        if not self._loaded:
+            self._loaded = True
+            try:
+                import tiktoken
+                self._encoding = tiktoken.get_encoding(self.encoding_name)
+            except Exception as e:
+                print(f"Token budgeting: cannot load {self.encoding_name} ({type(e).__name__}), estimating")
+        if self._encoding is None:
+            return len(text) // 4 + 1
+        return len(self._encoding.encode(text, disallowed_special=()))
+
+
+def trim_value(value: Any, stats: Dict[str, int]) -> Any:
+    """Shorten long strings and arrays, leaving a marker with what was cut"""
+    if isinstance(value, str) and len(value) > TOOL_FIELD_MAX_CHARS:
+        stats["fields"] += 1
+        return f"{value[:TOOL_FIELD_MAX_CHARS]}...[+{len(value) - TOOL_FIELD_MAX_CHARS} chars]"
+    if isinstance(value, dict):
+        return {key: trim_value(item, stats) for key, item in value.items()}
+    if isinstance(value, list):
+        if len(value) > TOOL_ARRAY_MAX_ITEMS:
+            stats["arrays"] += 1
+            kept = [trim_value(item, stats) for item in value[:TOOL_ARRAY_MAX_ITEMS]]
+            return kept + [f"...[+{len(value) - TOOL_ARRAY_MAX_ITEMS} more items]"]
+        return [trim_value(item, stats) for item in value]
+    return value
+
+
+class OverflowStore:
+    """Documents left out of a budgeted response, until fetch_more or expiry"""
+
+    def __init__(self, max_entries: int = 100, ttl: float = TOOL_OVERFLOW_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[str, List[Any], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, tool: str, documents: List[Any]) -> str:
+        handle = secrets.token_urlsafe(12)
+        with self._lock:
+            self._expire()
+            while len(self._entries) >= self.max_entries:
+                self._entries.popitem(last=False)
+            self._entries[handle] = (tool, documents, time.monotonic() + self.ttl)
+        return handle
+
+    def take(self, handle: str) -> Optional[Tuple[str, List[Any]]]:
+        with self._lock:
+            self._expire()
+            entry = self._entries.pop(handle, None)
+        return None if entry is None else entry[:2]
+
+    def _expire(self) -> None:
+        now = time.monotonic()
+        for handle in [key for key, (_, _, expires) in self._entries.items() if expires < now]:
+            del self._entries[handle]
+
+
+class ResponseBudget:
+    """
+    Fits the documents of a tool response into the tool's token budget.
+    Over budget, long fields and arrays are trimmed first; documents that
+    still do not fit are left out. The untrimmed originals of trimmed
+    documents, and the left-out documents unless the tool pages past them
+    itself, are held under a continuation handle that fetch_more redeems.
+    With hold=False (a server process per call, where no handle could be
+    redeemed) nothing is held: omitted documents are dropped and the
+    summary only reports what was cut.
+    """
+
+    def __init__(
+        self,
+        default: int = TOOL_TOKEN_BUDGET,
+        per_tool: Optional[Dict[str, int]] = None,
+        hold: bool = True
+    ):
+        self.default = default
+        self.hold = hold
+        self.per_tool = per_tool if per_tool is not None else parse_budgets(TOOL_TOKEN_BUDGETS)
+        self.counter = TokenCounter()
+        self.overflow = OverflowStore()
+
+    def budget(self, tool: str) -> int:
+        return self.per_tool.get(tool, self.default)
+
+    def fit(
+        self,
+        tool: str,
+        documents: List[Any],
+        trim: bool = True,
+        hold_omitted: bool = True
+    ) -> Tuple[List[Any], Optional[Dict[str, Any]]]:
+        """
+        Returns (documents to send, truncation summary or None if all fit
+        untouched). The documents sent are always the leading ones, so a
+        caller paging by position resumes after len(documents).
+        """
+        budget = self.budget(tool)
+        if budget <= 0 or not documents:
+            return documents, None
+        available = max(budget - ENVELOPE_TOKENS, 1)
+        costs = [self.counter.count(dumps(doc, indent=0)) for doc in documents]
+        if sum(costs) <= available:
+            return documents, None
+
+        stats = {"fields": 0, "arrays": 0}
+        kept, held, used = [], [], 0
+        for doc, cost in zip(documents, costs):
+            doc_stats = {"fields": 0, "arrays": 0}
+            sent = trim_value(doc, doc_stats) if trim else doc
+            if doc_stats["fields"] or doc_stats["arrays"]:
+                cost = self.counter.count(dumps(sent, indent=0))
+            # Always send at least one document, even if it alone is over budget
+            if kept and used + cost > available:
+                break
+            kept.append(sent)
+            used += cost
+            if doc_stats["fields"] or doc_stats["arrays"]:
+                held.append(doc)
+            stats["fields"] += doc_stats["fields"]
+            stats["arrays"] += doc_stats["arrays"]
+
+        omitted = documents[len(kept):]
+        summary: Dict[str, Any] = {
+            "token_budget": budget,
+            "returned": len(kept),
+            "omitted": len(omitted),
+            "trimmed_fields": stats["fields"],
+            "trimmed_arrays": stats["arrays"],
+        }
+        if hold_omitted:
+            held += omitted
+        if held and self.hold:
+            summary["continuation"] = self.overflow.put(tool, held)
+            summary["hint"] = "Call fetch_more with this continuation handle for the untrimmed and omitted documents"
+        elif omitted and not hold_omitted:
+            summary["hint"] = "Use next_token to continue after the last returned document"
+        elif omitted:
+            summary["hint"] = "Omitted documents were dropped; narrow the query or request fewer documents"
+        return kept, summary
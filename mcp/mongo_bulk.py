@@ -0,0 +1,120 @@
+import json
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from pymongo import DeleteMany, DeleteOne, InsertOne, ReplaceOne, UpdateMany, UpdateOne
+
+# Operation names follow the MongoDB shell's bulkWrite syntax, e.g.
+# {"insertOne": {"document": {...}}} or {"updateMany": {"filter": {...}, "update": {...}}}
+OPERATIONS = {
+    "insertOne": (InsertOne, ("document",), ()),
+    "updateOne": (UpdateOne, ("filter", "update"), ("upsert", "array_filters", "hint")),
+    "updateMany": (UpdateMany, ("filter", "update"), ("upsert", "array_filters", "hint")),
+    "replaceOne": (ReplaceOne, ("filter", "replacement"), ("upsert", "hint")),
+    "deleteOne": (DeleteOne, ("filter",), ("hint",)),
+    "deleteMany": (DeleteMany, ("filter",), ("hint",)),
+}
+
+# Arguments that must be objects; "update" may also be a pipeline (array of stages)
+OBJECT_FIELDS = ("document", "filter", "replacement", "update")
+
+# Accept the shell's camelCase spelling of the options too
+OPTION_ALIASES = {"arrayFilters": "array_filters"}
+
+
+def parse_operation(spec: Any):
+    """Turn one {"<op>": {...}} object into a PyMongo write model"""
+    if not isinstance(spec, dict) or len(spec) != 1:
+        raise ValueError("each operation must be an object with exactly one key, e.g. {\"insertOne\": {...}}")
+    name, args = next(iter(spec.items()))
+    if name not in OPERATIONS:
+        raise ValueError(f"unknown operation '{name}', expected one of {', '.join(OPERATIONS)}")
+    if not isinstance(args, dict):
+        raise ValueError(f"arguments of {name} must be an object")
+    model, required, optional = OPERATIONS[name]
+    missing = [field for field in required if field not in args]
+    if missing:
+        raise ValueError(f"{name} is missing {', '.join(missing)}")
+    for field in required:
+        value = args[field]
+        if field == "update" and isinstance(value, list) and all(isinstance(stage, dict) for stage in value):
+            continue
+        if field in OBJECT_FIELDS and not isinstance(value, dict):
+            expected = "an object or a pipeline" if field == "update" else "an object"
+            raise ValueError(f"{field} of {name} must be {expected}")
+    kwargs = {OPTION_ALIASES.get(key, key): value for key, value in args.items() if key not in required}
+    unknown = set(kwargs) - set(optional)
+    if unknown:
+        raise ValueError(f"{name} does not accept {', '.join(sorted(unknown))}")
+    return model(*(args[field] for field in required), **kwargs)
+
+
+def iter_operation_lines(operations: Optional[str], file_path: Optional[str]) -> Iterator[Tuple[int, Any]]:
+    """
+    Yield (operation index, JSON text) from an inline JSON array, inline
+    NDJSON or an NDJSON file. Files are read line by line, never whole, and
+    their lines are yielded as undecoded bytes.
+    """
+    if file_path:
+        with open(file_path, "rb") as f:
+            yield from _numbered(f)
+        return
+    text = (operations or "").strip()
+    if text.startswith("["):
+        items = json.loads(text)
+        for index, item in enumerate(items):
+            yield index, item
+        return
+    yield from _numbered(text.splitlines())
+
+
+def _numbered(lines: Iterable[Any]) -> Iterator[Tuple[int, Any]]:
+    index = 0
+    for line in lines:
+        line = line.strip()
+        if line:
+            yield index, line
+            index += 1
+
+
+def _encoded_size(item: Any) -> int:
+    if isinstance(item, bytes):
+        return len(item)
+    if isinstance(item, str):
+        return len(item.encode("utf-8"))
+    return len(json.dumps(item).encode("utf-8"))
+
+
+def iter_chunks(
+    operations: Optional[str],
+    file_path: Optional[str],
+    chunk_size: int,
+    chunk_bytes: int,
+    ordered: bool = False
+) -> Iterator[Tuple[List[Tuple[int, Any]], List[Dict[str, Any]]]]:
+    """
+    Group parsed operations into chunks bounded by count and by the UTF-8
+    size of their JSON text. Yields (chunk of (index, model), parse errors);
+    a line that does not decode or parse is reported instead of aborting the
+    whole load. When ordered, the chunk ends at the first such line and
+    nothing after it is read, so no later operation runs.
+    """
+    chunk, errors, size = [], [], 0
+    for index, item in iter_operation_lines(operations, file_path):
+        try:
+            text = item.decode("utf-8") if isinstance(item, bytes) else item
+            spec = json.loads(text) if isinstance(text, str) else text
+            model = parse_operation(spec)
+        except (ValueError, TypeError) as e:
+            # UnicodeDecodeError is a ValueError; PyMongo raises TypeError
+            # for option values of the wrong type
+            errors.append({"index": index, "message": f"invalid operation: {str(e)}"})
+            if ordered:
+                yield chunk, errors
+                return
+            continue
+        chunk.append((index, model))
+        size += _encoded_size(item)
+        if len(chunk) >= chunk_size or size >= chunk_bytes:
+            yield chunk, errors
+            chunk, errors, size = [], [], 0
+    if chunk or errors:
+        yield chunk, errors
@@ -0,0 +1,149 @@
+import asyncio
+import json
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Optional, Tuple
+from pymongo.errors import PyMongoError
+
+
+def cache_key(tool: str, database_name: str, collection_name: str, *args: Any) -> str:
+    """Key from the call's arguments, with dict keys sorted so equal filters share an entry"""
+    return json.dumps([tool, database_name, collection_name, *args], sort_keys=True, default=str)
+
+
+class ResultCache:
+    """
+    LRU cache of tool responses bounded by total bytes, with a TTL.
+
+    Entries belong to a (database, collection) namespace. Writers bump the
+    namespace generation when they start and finish (writing()), and a read
+    only stores its result if the generation it saw before querying is
+    still current, so a read racing a write never caches the old state.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, ttl: float = 30.0):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.enabled = max_bytes > 0
+        self._entries: "OrderedDict[str, Tuple[str, Tuple[str, str], float]]" = OrderedDict()
+        self._generations: dict = {}
+        self._epoch = 0
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def generation(self, database_name: str, collection_name: str) -> int:
+        # Bumped by collection, database and clear() invalidations alike
+        return (
+            self._epoch
+            + self._generations.get((database_name, None), 0)
+            + self._generations.get((database_name, collection_name), 0)
+        )
+
+    def get(self, key: str) -> Optional[str]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[2] < time.monotonic():
+                if entry is not None:
+                    self._drop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key: str, value: str, database_name: str, collection_name: str, generation: int) -> None:
+        size = len(value)
+        if not self.enabled or size > self.max_bytes:
+            return
+        with self._lock:
+            if self.generation(database_name, collection_name) != generation:
+                return
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (value, (database_name, collection_name), time.monotonic() + self.ttl)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, database_name: str, collection_name: Optional[str] = None) -> None:
+        """Drop a collection's entries, or a whole database's when collection_name is None"""
+        with self._lock:
+            bumped = (database_name, collection_name)
+            self._generations[bumped] = self._generations.get(bumped, 0) + 1
+            stale = [
+                key for key, (_, (db, coll), _) in self._entries.items()
+                if db == database_name and collection_name in (None, coll)
+            ]
+            for key in stale:
+                self._drop(key)
+            self.invalidations += 1
+
+    @contextmanager
+    def writing(self, database_name: str, collection_name: str):
+        """Invalidate a namespace around a write, whether or not it succeeds"""
+        self.invalidate(database_name, collection_name)
+        try:
+            yield
+        finally:
+            self.invalidate(database_name, collection_name)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._epoch += 1
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def _drop(self, key: str) -> None:
+        value, _, _ = self._entries.pop(key)
+        self._bytes -= len(value)
+
+
+class ChangeStreamInvalidator:
+    """
+    Watches the deployment's change stream and invalidates namespaces that
+    other clients write to. Needs a replica set or sharded cluster; on a
+    standalone server it logs once and stops, leaving the TTL to bound
+    staleness.
+    """
+
+    def __init__(self, cache: ResultCache):
+        self.cache = cache
+        self._task: Optional[asyncio.Task] = None
+
+    def ensure_started(self, client) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._watch(client))
+
+    async def _watch(self, client) -> None:
+        try:
+            async with await client.watch() as stream:
+                async for change in stream:
+                    namespace = change.get("ns") or {}
+                    if "db" in namespace:
+                        self.cache.invalidate(namespace["db"], namespace.get("coll"))
+                    else:
+                        self.cache.clear()
+        except PyMongoError as e:
+            print(f"Result cache change stream stopped: {e}")
+            self.cache.clear()
@@ -0,0 +1,51 @@
+import secrets
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+
+class CursorRegistry:
+    """
+    Open server-side cursors that a later tool call can continue, keyed by
+    an unguessable id. Entries idle for longer than idle_seconds are closed
+    lazily on the next access, and the oldest is closed once max_open
+    cursors are held. Cursors live in this process only, so continuation
+    needs a server that outlives the call (the inprocess transport).
+    """
+
+    def __init__(self, max_open: int = 100, idle_seconds: float = 300.0):
+        self.max_open = max_open
+        self.idle_seconds = idle_seconds
+        self._cursors: "OrderedDict[str, Tuple[Any, Dict[str, Any], float]]" = OrderedDict()
+
+    async def register(self, cursor: Any, meta: Dict[str, Any]) -> str:
+        await self.sweep()
+        while len(self._cursors) >= self.max_open:
+            _, (oldest, _, _) = self._cursors.popitem(last=False)
+            await oldest.close()
+        cursor_id = secrets.token_urlsafe(12)
+        self._cursors[cursor_id] = (cursor, meta, time.monotonic())
+        return cursor_id
+
+    async def take(self, cursor_id: str, meta: Optional[Dict[str, Any]] = None) -> Optional[Tuple[Any, Dict[str, Any]]]:
+        """
+        Remove and return (cursor, meta); re-register it to keep it open.
+        With meta, a cursor registered with different metadata is left in
+        place and None is returned.
+        """
+        await self.sweep()
+        entry = self._cursors.get(cursor_id)
+        if entry is None or (meta is not None and entry[1] != meta):
+            return None
+        cursor, registered, _ = self._cursors.pop(cursor_id)
+        return cursor, registered
+
+    async def sweep(self) -> None:
+        now = time.monotonic()
+        expired = [key for key, (_, _, touched) in self._cursors.items() if now - touched > self.idle_seconds]
+        for key in expired:
+            cursor, _, _ = self._cursors.pop(key)
+            await cursor.close()
+
+    def __len__(self) -> int:
+        return len(self._cursors)
@@ -1,11 +1,18 @@
 import os
+from pathlib import Path
 from typing import Optional, Dict, Any
-from pymongo import MongoClient
-from pymongo.errors import PyMongoError
-from bson import ObjectId
-from fastmcp import FastMCP
+from pymongo import AsyncMongoClient
+from pymongo.errors import BulkWriteError, PyMongoError
+from fastmcp import Context, FastMCP
 from dotenv import load_dotenv
 import json
+from mongo_budget import ResponseBudget
+from mongo_bulk import iter_chunks
+from mongo_cache import ChangeStreamInvalidator, ResultCache, cache_key
+from mongo_cursors import CursorRegistry
+from mongo_json import dumps
+from mongo_paging import encode_token, page_projection, page_query, parse_sort, strip_fields
+from mongo_profiler import QueryProfiler
 
 load_dotenv()
 
@@ -13,33 +20,92 @@ mcp = FastMCP(name="mongodb-mcp")
 
 # MongoDB configuration
 MONGO_URI = os.getenv("MONGO_URI")
-mongo_client: Optional[MongoClient] = None
+mongo_client: Optional[AsyncMongoClient] = None
 
+# Optional client settings; unset ones keep the driver defaults
+MONGO_CLIENT_OPTIONS = {
+    "maxPoolSize": ("MONGO_MAX_POOL_SIZE", int),
+    "minPoolSize": ("MONGO_MIN_POOL_SIZE", int),
+    "connectTimeoutMS": ("MONGO_CONNECT_TIMEOUT_MS", int),
+    "serverSelectionTimeoutMS": ("MONGO_SERVER_SELECTION_TIMEOUT_MS", int),
+    "timeoutMS": ("MONGO_TIMEOUT_MS", int),
+    "readPreference": ("MONGO_READ_PREFERENCE", str),
+}
 
-def get_mongo_client() -> MongoClient:
+# Largest page find_documents returns; bigger limits are capped to it
+FIND_MAX_LIMIT = int(os.getenv("MONGO_FIND_MAX_LIMIT", "1000"))
+
+# Documents per cursor batch / file write in stream_documents
+STREAM_BATCH_SIZE = int(os.getenv("MONGO_STREAM_BATCH_SIZE", "1000"))
+# The only directory stream_documents writes to and bulk_write reads from;
+# tool file paths are relative to it
+EXPORT_DIR = Path(os.getenv("MONGO_EXPORT_DIR", str(Path(__file__).parent.parent / "exports")))
+
+# bulk_write chunk bounds (operations and bytes of operation JSON), kept
+# well under the 48 MB batch the server accepts per round trip
+BULK_CHUNK_SIZE = int(os.getenv("MONGO_BULK_CHUNK_SIZE", "1000"))
+BULK_CHUNK_BYTES = int(os.getenv("MONGO_BULK_CHUNK_BYTES", str(8 * 1024 * 1024)))
+# Errors listed per chunk in the bulk_write response
+BULK_MAX_ERRORS = int(os.getenv("MONGO_BULK_MAX_ERRORS", "20"))
+
+# Set by clients that start a new server process for every tool call (the
+# stdio transport): nothing held in memory survives to the next call, so
+# aggregate hands out no cursor_id and budgeted responses no fetch_more handle
+PER_CALL_PROCESS = os.getenv("MCP_SERVER_PER_CALL", "").lower() in ("1", "true", "yes")
+
+# Server-side time limit for aggregate, and how long its open cursors may idle
+AGGREGATE_MAX_TIME_MS = int(os.getenv("MONGO_AGGREGATE_MAX_TIME_MS", "30000"))
+open_cursors = CursorRegistry(
+    max_open=int(os.getenv("MONGO_MAX_OPEN_CURSORS", "100")),
+    idle_seconds=float(os.getenv("MONGO_CURSOR_IDLE_SECONDS", "300"))
+)
+
+# Token budget for documents in find_documents / aggregate / fetch_more responses
+# (TOOL_TOKEN_BUDGET, TOOL_TOKEN_BUDGETS, see mongo_budget.py)
+response_budget = ResponseBudget(hold=not PER_CALL_PROCESS)
+
+# Read-through cache for find_documents / count_documents responses (off by default).
+# Writes through this server invalidate the collection; MONGO_RESULT_CACHE_WATCH
+# also follows a change stream for writes from other clients (replica sets only).
+RESULT_CACHE = os.getenv("MONGO_RESULT_CACHE", "false").lower() in ("1", "true", "yes")
+RESULT_CACHE_WATCH = os.getenv("MONGO_RESULT_CACHE_WATCH", "false").lower() in ("1", "true", "yes")
+result_cache = ResultCache(
+    max_bytes=int(os.getenv("MONGO_RESULT_CACHE_BYTES", str(64 * 1024 * 1024))) if RESULT_CACHE else 0,
+    ttl=float(os.getenv("MONGO_RESULT_CACHE_TTL", "30"))
+)
+cache_invalidator = ChangeStreamInvalidator(result_cache)
+
+
+def mongo_client_options() -> Dict[str, Any]:
+    options = {}
+    for option, (env_var, cast) in MONGO_CLIENT_OPTIONS.items():
+        value = os.getenv(env_var)
+        if value:
+            options[option] = cast(value)
+    return options
+
+
+def get_mongo_client() -> AsyncMongoClient:
     """Get or create MongoDB client"""
     global mongo_client
     if mongo_client is None:
-         mongo_client = MongoClient(MONGO_URI)
+         mongo_client = AsyncMongoClient(MONGO_URI, **mongo_client_options())
     return mongo_client
 
 
-def serialize_document(doc: Dict[str, Any]) -> Dict[str, Any]:
-    """Convert MongoDB document to JSON-serializable format"""
-    if doc is None:
-        return None
-    
-    serialized = {}
-    for key, value in doc.items():
-        if isinstance(value, ObjectId):
-            serialized[key] = str(value)
-        elif isinstance(value, dict):
-            serialized[key] = serialize_document(value)
-        elif isinstance(value, list):
-            serialized[key] = [serialize_document(item) if isinstance(item, dict) else item for item in value]
-        else:
-            serialized[key] = value
-    return serialized
+# Query timing, slow-query log and the shapes suggest_indexes works from.
+# Update, delete and count filters are explained as a find on the same filter,
+# which gets the same plan. The log is off unless MONGO_SLOW_QUERY_LOG is set;
+# a process per tool call keeps nothing else between calls, so there plans are
+# fetched before the call returns.
+profiler = QueryProfiler(
+    get_mongo_client,
+    threshold_ms=float(os.getenv("MONGO_SLOW_QUERY_MS", "100")),
+    log_path=os.getenv("MONGO_SLOW_QUERY_LOG") or None,
+    history_size=int(os.getenv("MONGO_PROFILER_HISTORY", "1000")),
+    max_bytes=int(os.getenv("MONGO_SLOW_QUERY_LOG_MAX_BYTES", str(10 * 1024 * 1024))),
+    inline_plans=PER_CALL_PROCESS
+)
 
 
 @mcp.tool()
@@ -49,11 +115,11 @@ async def list_databases() -> str:
     """
     try:
         client = get_mongo_client()
-        databases = client.list_database_names()
-        return json.dumps({
+        databases = await client.list_database_names()
+        return dumps({
             "databases": databases,
             "count": len(databases)
-        }, indent=2)
+        })
     except PyMongoError as e:
         return f"Error listing databases: {str(e)}"
 
@@ -66,52 +132,210 @@ async def list_collections(database_name: str) -> str:
     try:
         client = get_mongo_client()
         db = client[database_name]
-        collections = db.list_collection_names()
-        return json.dumps({
+        collections = await db.list_collection_names()
+        return dumps({
             "database": database_name,
             "collections": collections,
             "count": len(collections)
-        }, indent=2)
+        })
     except PyMongoError as e:
         return f"Error listing collections: {str(e)}"
 
 
+def cached_result(key: str) -> Optional[str]:
+    """Cached response for key, starting the change stream listener on first use if enabled"""
+    if not result_cache.enabled:
+        return None
+    if RESULT_CACHE_WATCH:
+        cache_invalidator.ensure_started(get_mongo_client())
+    return result_cache.get(key)
+
+
+def with_truncation(payload: Dict[str, Any], truncated: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Attach the token budget summary to a response when documents were trimmed or held back"""
+    if truncated is not None:
+        payload["truncated"] = truncated
+    return payload
+
+
+def parse_json_argument(value: Optional[str], name: str) -> Dict[str, Any]:
+    """Parse an optional JSON object argument, raising ValueError with a tool-facing message"""
+    if not value:
+        return {}
+    try:
+        parsed = json.loads(value)
+    except json.JSONDecodeError:
+        raise ValueError(f"Invalid {name} JSON")
+    if not isinstance(parsed, dict):
+        raise ValueError(f"{name.capitalize()} must be a JSON object")
+    return parsed
+
+
+def resolve_export_path(path: str) -> Path:
+    """Resolve a tool-supplied file path inside EXPORT_DIR, raising ValueError for anything outside it"""
+    relative = Path(path)
+    if not path or relative.is_absolute() or ".." in relative.parts:
+        raise ValueError(f"File paths must be relative to the export directory, without '..': {path}")
+    base = EXPORT_DIR.resolve()
+    resolved = (base / relative).resolve()
+    # Catches symlinks inside the directory that point out of it
+    if resolved == base or not resolved.is_relative_to(base):
+        raise ValueError(f"File path is outside the export directory: {path}")
+    return resolved
+
+
 @mcp.tool()
 async def find_documents(
     database_name: str,
     collection_name: str,
     filter_query: Optional[str] = None,
-    limit: int = 10
+    limit: int = 10,
+    projection: Optional[str] = None,
+    sort: Optional[str] = None,
+    batch_size: Optional[int] = None,
+    continuation_token: Optional[str] = None,
+    output_format: str = "json"
 ) -> str:
     """
-    Find documents in a collection
+    Find one page of documents in a collection (limit is 1 to the server's maximum page size).
+    projection and sort are JSON objects, e.g. '{"name": 1}' and '{"age": -1}'.
+    If more documents match, the response has a next_token; pass it back as
+    continuation_token (with the same filter and sort) to get the next page.
+    output_format "ndjson" returns one document per line, followed by a
+    {"next_token": ...} line.
     """
+    if limit < 1:
+        return "Error: limit must be at least 1"
+    if batch_size is not None and batch_size < 0:
+        return "Error: batch_size must not be negative"
+    limit = min(limit, FIND_MAX_LIMIT)
+    try:
+        query = parse_json_argument(filter_query, "filter query")
+        fields = parse_json_argument(projection, "projection") or None
+        sort_spec = parse_sort(sort)
+        if output_format not in ("json", "ndjson"):
+            return "Error: output_format must be 'json' or 'ndjson'"
+        fields, hidden = page_projection(fields, sort_spec)
+        paged_query = page_query(query, sort_spec, continuation_token)
+    except ValueError as e:
+        return f"Error: {str(e)}"
+
+    key = cache_key(
+        "find_documents", database_name, collection_name,
+        query, fields, sort_spec, limit, continuation_token, output_format
+    )
+    cached = cached_result(key)
+    if cached is not None:
+        return cached
+
     try:
         client = get_mongo_client()
         db = client[database_name]
         collection = db[collection_name]
-        
-        # Parse filter query if provided
-        query = {}
-        if filter_query:
-            try:
-                query = json.loads(filter_query)
-            except json.JSONDecodeError:
-                return "Error: Invalid filter query JSON"
-        
-        # Find documents
-        documents = list(collection.find(query).limit(limit))
-        serialized_docs = [serialize_document(doc) for doc in documents]
-        
-        return json.dumps({
+        generation = result_cache.generation(database_name, collection_name)
+
+        # Fetch one extra document to know whether another page exists
+        cursor = collection.find(paged_query, fields).sort(sort_spec).limit(limit + 1)
+        if batch_size:
+            cursor = cursor.batch_size(batch_size)
+        async with profiler.measure("find_documents", database_name, collection_name, query, sort_spec):
+            documents = await cursor.to_list()
+
+        has_more = len(documents) > limit
+        page = documents[:limit]
+        documents = [strip_fields(doc, hidden) for doc in page]
+        # Documents over the token budget are left out and next_token resumes
+        # after the last one returned, so paging works across server processes
+        documents, truncated = response_budget.fit("find_documents", documents, hold_omitted=False)
+        next_token = None
+        if has_more or len(documents) < len(page):
+            next_token = encode_token(sort_spec, page[len(documents) - 1])
+
+        if output_format == "ndjson":
+            lines = [dumps(doc, indent=0) for doc in documents]
+            lines.append(dumps(with_truncation({"next_token": next_token}, truncated), indent=0))
+            response = "\n".join(lines)
+        else:
+            response = dumps(with_truncation({
+                "database": database_name,
+                "collection": collection_name,
+                "filter": query,
+                "count": len(documents),
+                "documents": documents,
+                "next_token": next_token
+            }, truncated))
+        # Continuation handles are single use, so only complete responses are cached
+        if truncated is None:
+            result_cache.set(key, response, database_name, collection_name, generation)
+        return response
+    except PyMongoError as e:
+        return f"Error finding documents: {str(e)}"
+
+
+@mcp.tool()
+async def stream_documents(
+    database_name: str,
+    collection_name: str,
+    output_path: str,
+    filter_query: Optional[str] = None,
+    projection: Optional[str] = None,
+    sort: Optional[str] = None,
+    batch_size: int = STREAM_BATCH_SIZE,
+    max_documents: Optional[int] = None,
+    ctx: Optional[Context] = None
+) -> str:
+    """
+    Export matching documents to an NDJSON file, one document per line.
+    output_path is relative to the server's export directory. The cursor is
+    read and written batch_size documents at a time, so large collections
+    never have to fit in memory. Returns a summary, not the data.
+    """
+    if batch_size < 1:
+        return "Error: batch_size must be at least 1"
+    try:
+        query = parse_json_argument(filter_query, "filter query")
+        fields = parse_json_argument(projection, "projection") or None
+        sort_spec = parse_sort(sort)
+        export_path = resolve_export_path(output_path)
+    except ValueError as e:
+        return f"Error: {str(e)}"
+
+    written = 0
+    try:
+        client = get_mongo_client()
+        collection = client[database_name][collection_name]
+        cursor = collection.find(query, fields).sort(sort_spec).batch_size(batch_size)
+        if max_documents:
+            cursor = cursor.limit(max_documents)
+
+        export_path.parent.mkdir(parents=True, exist_ok=True)
+        async with profiler.measure("stream_documents", database_name, collection_name, query, sort_spec):
+            with open(export_path, "w", encoding="utf-8") as f:
+                chunk = []
+                async for doc in cursor:
+                    chunk.append(dumps(doc, indent=0))
+                    if len(chunk) >= batch_size:
+                        f.write("\n".join(chunk) + "\n")
+                        written += len(chunk)
+                        chunk = []
+                        if ctx is not None:
+                            await ctx.report_progress(written, max_documents)
+                if chunk:
+                    f.write("\n".join(chunk) + "\n")
+                    written += len(chunk)
+
+        return dumps({
             "database": database_name,
             "collection": collection_name,
             "filter": query,
-            "count": len(serialized_docs),
-            "documents": serialized_docs
-        }, indent=2)
+            "output_path": output_path,
+            "count": written,
+            "bytes": os.path.getsize(export_path)
+        })
     except PyMongoError as e:
-        return f"Error finding documents: {str(e)}"
+        return f"Error streaming documents after {written} documents: {str(e)}"
+    except OSError as e:
+        return f"Error writing {output_path}: {str(e)}"
 
 
 @mcp.tool()
@@ -135,14 +359,15 @@ async def insert_document(
             return "Error: Invalid document JSON"
         
         # Insert document
-        result = collection.insert_one(doc)
+        with result_cache.writing(database_name, collection_name):
+            result = await collection.insert_one(doc)
         
-        return json.dumps({
+        return dumps({
             "database": database_name,
             "collection": collection_name,
             "inserted_id": str(result.inserted_id),
             "acknowledged": result.acknowledged
-        }, indent=2)
+        })
     except PyMongoError as e:
         return f"Error inserting document: {str(e)}"
 
@@ -170,15 +395,16 @@ async def insert_many_documents(
             return "Error: Invalid documents JSON"
         
         # Insert documents
-        result = collection.insert_many(docs)
+        with result_cache.writing(database_name, collection_name):
+            result = await collection.insert_many(docs)
         
-        return json.dumps({
+        return dumps({
             "database": database_name,
             "collection": collection_name,
             "inserted_ids": [str(id) for id in result.inserted_ids],
             "count": len(result.inserted_ids),
             "acknowledged": result.acknowledged
-        }, indent=2)
+        })
     except PyMongoError as e:
         return f"Error inserting documents: {str(e)}"
 
@@ -207,16 +433,18 @@ async def update_document(
             return "Error: Invalid JSON in filter or update data"
         
         # Update document
-        result = collection.update_one(filter_dict, update_dict, upsert=upsert)
+        async with profiler.measure("update_document", database_name, collection_name, filter_dict):
+            with result_cache.writing(database_name, collection_name):
+                result = await collection.update_one(filter_dict, update_dict, upsert=upsert)
         
-        return json.dumps({
+        return dumps({
             "database": database_name,
             "collection": collection_name,
             "matched_count": result.matched_count,
             "modified_count": result.modified_count,
             "upserted_id": str(result.upserted_id) if result.upserted_id else None,
             "acknowledged": result.acknowledged
-        }, indent=2)
+        })
     except PyMongoError as e:
         return f"Error updating document: {str(e)}"
 
@@ -244,15 +472,17 @@ async def update_many_documents(
             return "Error: Invalid JSON in filter or update data"
         
         # Update documents
-        result = collection.update_many(filter_dict, update_dict)
+        async with profiler.measure("update_many_documents", database_name, collection_name, filter_dict):
+            with result_cache.writing(database_name, collection_name):
+                result = await collection.update_many(filter_dict, update_dict)
         
-        return json.dumps({
+        return dumps({
             "database": database_name,
             "collection": collection_name,
             "matched_count": result.matched_count,
             "modified_count": result.modified_count,
             "acknowledged": result.acknowledged
-        }, indent=2)
+        })
     except PyMongoError as e:
         return f"Error updating documents: {str(e)}"
 
@@ -278,14 +508,16 @@ async def delete_document(
             return "Error: Invalid filter query JSON"
         
         # Delete document
-        result = collection.delete_one(filter_dict)
+        async with profiler.measure("delete_document", database_name, collection_name, filter_dict):
+            with result_cache.writing(database_name, collection_name):
+                result = await collection.delete_one(filter_dict)
         
-        return json.dumps({
+        return dumps({
             "database": database_name,
             "collection": collection_name,
             "deleted_count": result.deleted_count,
             "acknowledged": result.acknowledged
-        }, indent=2)
+        })
     except PyMongoError as e:
         return f"Error deleting document: {str(e)}"
 
@@ -311,26 +543,133 @@ async def delete_many_documents(
             return "Error: Invalid filter query JSON"
         
         # Delete documents
-        result = collection.delete_many(filter_dict)
+        async with profiler.measure("delete_many_documents", database_name, collection_name, filter_dict):
+            with result_cache.writing(database_name, collection_name):
+                result = await collection.delete_many(filter_dict)
         
-        return json.dumps({
+        return dumps({
             "database": database_name,
             "collection": collection_name,
             "deleted_count": result.deleted_count,
             "acknowledged": result.acknowledged
-        }, indent=2)
+        })
     except PyMongoError as e:
         return f"Error deleting documents: {str(e)}"
 
 
+@mcp.tool()
+async def bulk_write(
+    database_name: str,
+    collection_name: str,
+    operations: Optional[str] = None,
+    file_path: Optional[str] = None,
+    chunk_size: int = BULK_CHUNK_SIZE,
+    ordered: bool = False
+) -> str:
+    """
+    Run many insert/update/replace/delete operations in chunks.
+    Operations use the shell's bulkWrite syntax, one per line (NDJSON) or as
+    a JSON array, e.g. {"insertOne": {"document": {...}}},
+    {"updateOne": {"filter": {...}, "update": {...}, "upsert": true}},
+    {"replaceOne": {"filter": {...}, "replacement": {...}}},
+    {"deleteMany": {"filter": {...}}}.
+    Pass them inline in operations, or give file_path of an NDJSON file in the
+    server's export directory (relative to it) for loads too large for one argument. Chunks run unordered by default,
+    so one failing operation does not stop the rest; the response lists the
+    results and errors of each chunk.
+    """
+    if bool(operations) == bool(file_path):
+        return "Error: Provide exactly one of operations or file_path"
+    if file_path:
+        try:
+            file_path = str(resolve_export_path(file_path))
+        except ValueError as e:
+            return f"Error: {str(e)}"
+
+    client = get_mongo_client()
+    collection = client[database_name][collection_name]
+    totals = {"inserted": 0, "matched": 0, "modified": 0, "deleted": 0, "upserted": 0, "errors": 0}
+    chunks = []
+    try:
+        for number, (chunk, parse_errors) in enumerate(iter_chunks(operations, file_path, chunk_size, BULK_CHUNK_BYTES, ordered)):
+            report = {"chunk": number, "operations": len(chunk), "errors": list(parse_errors)}
+            if chunk:
+                indexes = [index for index, _ in chunk]
+                report["first_index"] = indexes[0]
+                try:
+                    with result_cache.writing(database_name, collection_name):
+                        result = await collection.bulk_write([model for _, model in chunk], ordered=ordered)
+                    counts = {
+                        "inserted": result.inserted_count,
+                        "matched": result.matched_count,
+                        "modified": result.modified_count,
+                        "deleted": result.deleted_count,
+                        "upserted": result.upserted_count,
+                    }
+                except BulkWriteError as e:
+                    details = e.details
+                    counts = {
+                        "inserted": details.get("nInserted", 0),
+                        "matched": details.get("nMatched", 0),
+                        "modified": details.get("nModified", 0),
+                        "deleted": details.get("nRemoved", 0),
+                        "upserted": details.get("nUpserted", 0),
+                    }
+                    # Map chunk positions back to the operation's index in the input
+                    report["errors"].extend(
+                        {"index": indexes[error["index"]], "code": error.get("code"), "message": error.get("errmsg")}
+                        for error in details.get("writeErrors", [])
+                    )
+                report.update(counts)
+                for key, value in counts.items():
+                    totals[key] += value
+
+            totals["errors"] += len(report["errors"])
+            if len(report["errors"]) > BULK_MAX_ERRORS:
+                report["errors_truncated"] = len(report["errors"]) - BULK_MAX_ERRORS
+                report["errors"] = report["errors"][:BULK_MAX_ERRORS]
+            chunks.append(report)
+            if ordered and report["errors"]:
+                break
+    except (PyMongoError, TypeError) as e:
+        # Earlier chunks are already committed, so report them with the error
+        return dumps({
+            "database": database_name,
+            "collection": collection_name,
+            "error": f"Bulk write stopped after {len(chunks)} chunks: {str(e)}",
+            "totals": totals,
+            "chunks": chunks
+        })
+    except ValueError as e:
+        return f"Error: Invalid operations JSON: {str(e)}"
+    except OSError as e:
+        return f"Error reading {file_path}: {str(e)}"
+
+    return dumps({
+        "database": database_name,
+        "collection": collection_name,
+        "ordered": ordered,
+        "totals": totals,
+        "chunks": chunks
+    })
+
+
 @mcp.tool()
 async def count_documents(
     database_name: str,
     collection_name: str,
-    filter_query: Optional[str] = None
+    filter_query: Optional[str] = None,
+    max_time_ms: Optional[int] = None,
+    hint: Optional[str] = None,
+    exact: bool = False
 ) -> str:
     """
-    Count documents in a collection
+    Count documents in a collection.
+    Without a filter the count comes from collection metadata (instant, but
+    estimated: it can be off after an unclean shutdown or on sharded
+    clusters with orphaned documents); set exact=true for a full count.
+    For filtered counts, max_time_ms caps the server time and hint names
+    the index to use, as an index name or a key object like '{"status": 1}'.
     """
     try:
         client = get_mongo_client()
@@ -344,20 +683,307 @@ async def count_documents(
                 query = json.loads(filter_query)
             except json.JSONDecodeError:
                 return "Error: Invalid filter query JSON"
+
+        options: Dict[str, Any] = {}
+        if max_time_ms:
+            options["maxTimeMS"] = max_time_ms
+        if hint:
+            try:
+                options["hint"] = list(parse_json_argument(hint, "hint").items()) if hint.lstrip().startswith("{") else hint
+            except ValueError as e:
+                return f"Error: {str(e)}"
+        estimated = not query and not exact and "hint" not in options
         
+        key = cache_key("count_documents", database_name, collection_name, query, estimated)
+        cached = cached_result(key)
+        if cached is not None:
+            return cached
+        generation = result_cache.generation(database_name, collection_name)
+
         # Count documents
-        count = collection.count_documents(query)
+        async with profiler.measure("count_documents", database_name, collection_name, query):
+            if estimated:
+                count = await collection.estimated_document_count(**options)
+            else:
+                count = await collection.count_documents(query, **options)
         
-        return json.dumps({
+        response = dumps({
             "database": database_name,
             "collection": collection_name,
             "filter": query,
-            "count": count
-        }, indent=2)
+            "count": count,
+            "estimated": estimated
+        })
+        result_cache.set(key, response, database_name, collection_name, generation)
+        return response
     except PyMongoError as e:
         return f"Error counting documents: {str(e)}"
 
 
+@mcp.tool()
+async def collection_stats(database_name: str, collection_name: str) -> str:
+    """
+    Size, document count, average document size and index sizes of a
+    collection, from collection metadata (no scan)
+    """
+    try:
+        client = get_mongo_client()
+        db = client[database_name]
+        stats = await db.command("collStats", collection_name)
+        indexes = await db[collection_name].index_information()
+        return dumps({
+            "database": database_name,
+            "collection": collection_name,
+            "count": stats.get("count"),
+            "size_bytes": stats.get("size"),
+            "avg_document_bytes": stats.get("avgObjSize"),
+            "storage_bytes": stats.get("storageSize"),
+            "capped": stats.get("capped", False),
+            "index_count": stats.get("nindexes"),
+            "total_index_bytes": stats.get("totalIndexSize"),
+            "indexes": [
+                {"name": name, "keys": dict(info["key"]), "size_bytes": stats.get("indexSizes", {}).get(name)}
+                for name, info in indexes.items()
+            ]
+        })
+    except PyMongoError as e:
+        return f"Error getting collection stats: {str(e)}"
+
+
+@mcp.tool()
+async def aggregate(
+    database_name: str,
+    collection_name: str,
+    pipeline: Optional[str] = None,
+    allow_disk_use: bool = False,
+    max_time_ms: int = AGGREGATE_MAX_TIME_MS,
+    batch_size: int = 100,
+    cursor_id: Optional[str] = None,
+    explain: bool = False,
+    explain_verbosity: str = "queryPlanner"
+) -> str:
+    """
+    Run an aggregation pipeline inside MongoDB and return one batch of results.
+    pipeline is a JSON array of stages, e.g.
+    '[{"$match": {"status": "A"}}, {"$group": {"_id": "$region", "total": {"$sum": "$amount"}}}]'.
+    Prefer $group/$count/$project here over pulling raw documents with find_documents.
+    If more results remain, the response has a cursor_id; call again with only
+    database_name, collection_name and cursor_id to get the next batch. When
+    the server cannot keep cursors between calls, cursor_id is null and
+    more_results is true instead: narrow the pipeline ($match, $limit) or
+    page it with $sort plus $skip. Results over the response's token budget
+    are listed as omitted in "truncated"; without a continuation handle
+    there they are dropped, so rerun with a smaller batch_size or $project.
+    explain=true returns the query plan instead of running the pipeline.
+    $out and $merge stages are not allowed.
+    """
+    if cursor_id:
+        entry = await open_cursors.take(cursor_id, {"database": database_name, "collection": collection_name})
+        if entry is None:
+            return "Error: Unknown or expired cursor_id for this collection; run the aggregation again"
+        cursor, meta = entry
+        try:
+            return await aggregate_batch(cursor, meta, batch_size)
+        except PyMongoError as e:
+            return f"Error continuing aggregation: {str(e)}"
+
+    try:
+        stages = json.loads(pipeline or "[]")
+    except json.JSONDecodeError:
+        return "Error: Invalid pipeline JSON"
+    if not isinstance(stages, list) or not all(isinstance(stage, dict) for stage in stages):
+        return "Error: Pipeline must be a JSON array of stage objects"
+    writes = sorted({name for stage in stages for name in stage if name in ("$out", "$merge")})
+    if writes:
+        return f"Error: {', '.join(writes)} stages are not allowed; aggregate is read-only"
+
+    try:
+        client = get_mongo_client()
+        db = client[database_name]
+        collection = db[collection_name]
+
+        if explain:
+            plan = await db.command({
+                "explain": {"aggregate": collection_name, "pipeline": stages, "cursor": {}},
+                "verbosity": explain_verbosity
+            })
+            return dumps({
+                "database": database_name,
+                "collection": collection_name,
+                "explain": plan
+            })
+
+        # The leading $match / $sort decide which index the pipeline can use
+        match = stages[0].get("$match") if stages else None
+        sort = stages[1].get("$sort") if match is not None and len(stages) > 1 else None
+        async with profiler.measure(
+            "aggregate", database_name, collection_name, match, list((sort or {}).items()),
+            explain_command={"aggregate": collection_name, "pipeline": stages, "cursor": {}}
+        ):
+            cursor = await collection.aggregate(
+                stages, allowDiskUse=allow_disk_use, maxTimeMS=max_time_ms, batchSize=batch_size
+            )
+        meta = {"database": database_name, "collection": collection_name}
+        return await aggregate_batch(cursor, meta, batch_size)
+    except PyMongoError as e:
+        return f"Error running aggregation: {str(e)}"
+
+
+async def aggregate_batch(cursor, meta: Dict[str, Any], batch_size: int) -> str:
+    """Read one batch from an aggregation cursor, keeping it open if more remain"""
+    try:
+        documents = await cursor.to_list(batch_size)
+    except PyMongoError:
+        # Otherwise the server keeps the cursor until its own timeout
+        try:
+            await cursor.close()
+        except PyMongoError:
+            pass
+        raise
+    next_cursor_id = None
+    more_results = cursor.alive
+    if more_results and not PER_CALL_PROCESS:
+        next_cursor_id = await open_cursors.register(cursor, meta)
+    else:
+        await cursor.close()
+    documents, truncated = response_budget.fit("aggregate", documents)
+    return dumps(with_truncation({
+        "database": meta["database"],
+        "collection": meta["collection"],
+        "count": len(documents),
+        "documents": documents,
+        "cursor_id": next_cursor_id,
+        "more_results": more_results
+    }, truncated))
+
+
+@mcp.tool()
+async def fetch_more(continuation: str) -> str:
+    """
+    Get the full versions of documents that were trimmed, and documents
+    that were left out, of an earlier find_documents, aggregate or
+    fetch_more response to keep it within its token budget. Pass the
+    "continuation" handle from that response's "truncated" section.
+    """
+    entry = response_budget.overflow.take(continuation)
+    if entry is None:
+        return "Error: Unknown or expired continuation handle; run the query again"
+    tool, documents = entry
+    # Sent untrimmed; whatever does not fit gets a new handle
+    documents, truncated = response_budget.fit("fetch_more", documents, trim=False)
+    return dumps(with_truncation({
+        "source_tool": tool,
+        "count": len(documents),
+        "documents": documents
+    }, truncated))
+
+
+@mcp.tool()
+async def slow_queries(limit: int = 20) -> str:
+    """
+    List recent queries that exceeded the slow-query threshold, with their
+    filter shape, duration and winning plan (COLLSCAN means no index was used)
+    """
+    entries = await profiler.slow_queries(limit)
+    return dumps({
+        "threshold_ms": profiler.threshold_ms,
+        "count": len(entries),
+        "queries": entries
+    })
+
+
+@mcp.tool()
+async def suggest_indexes(database_name: str, collection_name: Optional[str] = None) -> str:
+    """
+    Recommend indexes from recent query shapes, following the
+    Equality, Sort, Range rule. Suggestions already served by an existing
+    index (same leading keys) are marked with covered_by.
+    """
+    try:
+        client = get_mongo_client()
+        db = client[database_name]
+        suggestions = await profiler.suggestions(database_name, collection_name)
+        existing = {}
+        for suggestion in suggestions:
+            name = suggestion["collection"]
+            if name not in existing:
+                existing[name] = await db[name].index_information()
+            keys = list(suggestion["keys"].items())
+            suggestion["covered_by"] = next(
+                (index for index, info in existing[name].items() if [tuple(k) for k in info["key"][:len(keys)]] == keys),
+                None
+            )
+        return dumps({
+            "database": database_name,
+            "collection": collection_name,
+            "count": len(suggestions),
+            "suggestions": suggestions
+        })
+    except PyMongoError as e:
+        return f"Error suggesting indexes: {str(e)}"
+
+
+@mcp.tool()
+async def list_indexes(database_name: str, collection_name: str) -> str:
+    """
+    List the indexes of a collection
+    """
+    try:
+        client = get_mongo_client()
+        collection = client[database_name][collection_name]
+        cursor = await collection.list_indexes()
+        indexes = await cursor.to_list()
+        return dumps({
+            "database": database_name,
+            "collection": collection_name,
+            "count": len(indexes),
+            "indexes": indexes
+        })
+    except PyMongoError as e:
+        return f"Error listing indexes: {str(e)}"
+
+
+@mcp.tool()
+async def create_index(
+    database_name: str,
+    collection_name: str,
+    keys: str,
+    name: Optional[str] = None,
+    unique: bool = False,
+    partial_filter: Optional[str] = None
+) -> str:
+    """
+    Create an index. keys is a JSON object of field to 1 (ascending),
+    -1 (descending), "text", "hashed" or "2dsphere", in index order,
+    e.g. '{"status": 1, "created_at": -1}'.
+    """
+    try:
+        key_spec = parse_json_argument(keys, "keys")
+        partial = parse_json_argument(partial_filter, "partial filter")
+    except ValueError as e:
+        return f"Error: {str(e)}"
+    if not key_spec:
+        return "Error: keys must name at least one field"
+
+    options: Dict[str, Any] = {"unique": unique}
+    if name:
+        options["name"] = name
+    if partial:
+        options["partialFilterExpression"] = partial
+    try:
+        client = get_mongo_client()
+        collection = client[database_name][collection_name]
+        index_name = await collection.create_index(list(key_spec.items()), **options)
+        return dumps({
+            "database": database_name,
+            "collection": collection_name,
+            "index": index_name,
+            "keys": key_spec
+        })
+    except PyMongoError as e:
+        return f"Error creating index: {str(e)}"
+
+
 @mcp.tool()
 async def create_collection(
     database_name: str,
@@ -369,13 +995,14 @@ async def create_collection(
     try:
         client = get_mongo_client()
         db = client[database_name]
-        db.create_collection(collection_name)
+        with result_cache.writing(database_name, collection_name):
+            await db.create_collection(collection_name)
         
-        return json.dumps({
+        return dumps({
             "database": database_name,
             "collection": collection_name,
             "status": "created"
-        }, indent=2)
+        })
     except PyMongoError as e:
         return f"Error creating collection: {str(e)}"
 
@@ -391,13 +1018,14 @@ async def drop_collection(
     try:
         client = get_mongo_client()
         db = client[database_name]
-        db.drop_collection(collection_name)
+        with result_cache.writing(database_name, collection_name):
+            await db.drop_collection(collection_name)
         
-        return json.dumps({
+        return dumps({
             "database": database_name,
             "collection": collection_name,
             "status": "dropped"
-        }, indent=2)
+        })
     except PyMongoError as e:
         return f"Error dropping collection: {str(e)}"
 
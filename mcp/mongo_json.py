@@ -0,0 +1,86 @@
+import base64
+import datetime
+import json
+import os
+import uuid
+from decimal import Decimal
+from typing import Any
+from bson import Binary, Code, DBRef, Decimal128, MaxKey, MinKey, ObjectId, Regex, Timestamp
+from dotenv import load_dotenv
+
+load_dotenv()
+
+try:
+    import orjson
+except ImportError:  # optional, the stdlib encoder is used instead
+    orjson = None
+
+# "auto" uses orjson when it is installed, "orjson" / "json" force a backend
+MONGO_JSON_BACKEND = os.getenv("MONGO_JSON_BACKEND", "auto")
+# Indent tool responses for reading them by hand; compact by default
+MONGO_JSON_INDENT = int(os.getenv("MONGO_JSON_INDENT", "0"))
+
+
+def _binary(value: Binary) -> str:
+    if value.subtype in (3, 4):
+        return str(value.as_uuid(value.subtype))
+    return base64.b64encode(value).decode("ascii")
+
+
+# Exact-type dispatch for the BSON types json/orjson do not know
+_ENCODERS = {
+    ObjectId: str,
+    datetime.datetime: datetime.datetime.isoformat,
+    datetime.date: datetime.date.isoformat,
+    Decimal128: str,
+    Decimal: str,
+    uuid.UUID: str,
+    Binary: _binary,
+    bytes: lambda value: base64.b64encode(value).decode("ascii"),
+    Timestamp: lambda value: {"t": value.time, "i": value.inc},
+    Regex: lambda value: {"pattern": value.pattern, "flags": value.flags},
+    Code: str,
+    DBRef: lambda value: {"$ref": value.collection, "$id": value.id},
+    MinKey: lambda value: {"$minKey": 1},
+    MaxKey: lambda value: {"$maxKey": 1},
+    set: list,
+    frozenset: list,
+    tuple: list,
+}
+
+
+def bson_default(value: Any) -> Any:
+    """
+    Encoder fallback, called only for values json/orjson cannot encode
+    natively while they walk the document once. Subclasses of the known
+    types fall back to an isinstance scan.
+    """
+    encoder = _ENCODERS.get(type(value))
+    if encoder is None:
+        encoder = next((fn for cls, fn in _ENCODERS.items() if isinstance(value, cls)), None)
+        if encoder is None:
+            raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+    return encoder(value)
+
+
+def _use_orjson() -> bool:
+    if MONGO_JSON_BACKEND == "json":
+        return False
+    if MONGO_JSON_BACKEND == "orjson" and orjson is None:
+        raise RuntimeError("MONGO_JSON_BACKEND=orjson but orjson is not installed")
+    return orjson is not None
+
+
+USE_ORJSON = _use_orjson()
+
+
+def dumps(obj: Any, indent: int = MONGO_JSON_INDENT) -> str:
+    """Serialize a tool response (documents included) to JSON in one pass"""
+    if USE_ORJSON:
+        option = orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=bson_default, option=option).decode("utf-8")
+    if indent:
+        return json.dumps(obj, default=bson_default, indent=indent, ensure_ascii=False)
+    return json.dumps(obj, default=bson_default, separators=(",", ":"), ensure_ascii=False)
@@ -0,0 +1,145 @@
+import base64
+import json
+from typing import Any, Dict, List, Optional, Tuple
+from bson import json_util
+from bson.json_util import CANONICAL_JSON_OPTIONS
+
+SortSpec = List[Tuple[str, int]]
+
+
+class PagingError(ValueError):
+    """Invalid sort specification or continuation token"""
+
+
+def parse_sort(sort: Optional[str]) -> SortSpec:
+    """
+    Parse a JSON sort like '{"age": -1}' into [(field, direction), ...]
+    with _id appended as the final tie-breaker, so every position is unique.
+    """
+    spec: SortSpec = []
+    if sort:
+        try:
+            raw = json.loads(sort)
+        except json.JSONDecodeError:
+            raise PagingError("Invalid sort JSON")
+        if not isinstance(raw, dict):
+            raise PagingError("Sort must be a JSON object like {\"field\": 1}")
+        for field, direction in raw.items():
+            if direction not in (1, -1):
+                raise PagingError(f"Sort direction for '{field}' must be 1 or -1")
+            spec.append((field, direction))
+    if not any(field == "_id" for field, _ in spec):
+        spec.append(("_id", spec[-1][1] if spec else 1))
+    return spec
+
+
+def get_path(doc: Dict[str, Any], path: str) -> Any:
+    """Value at a dotted path, or None if any part is missing"""
+    value: Any = doc
+    for part in path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return None
+        value = value[part]
+    return value
+
+
+def encode_token(sort_spec: SortSpec, last_doc: Dict[str, Any]) -> str:
+    """Opaque token holding the sort key values of the last returned document"""
+    payload = {"s": sort_spec, "v": [get_path(last_doc, field) for field, _ in sort_spec]}
+    raw = json_util.dumps(payload, json_options=CANONICAL_JSON_OPTIONS)
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_token(token: str, sort_spec: SortSpec) -> list:
+    try:
+        payload = json_util.loads(base64.urlsafe_b64decode(token.encode("ascii")).decode("utf-8"))
+    except (ValueError, UnicodeDecodeError):
+        raise PagingError("Invalid continuation token")
+    if (
+        not isinstance(payload, dict)
+        or not isinstance(payload.get("s"), list)
+        or not isinstance(payload.get("v"), list)
+        or len(payload["v"]) != len(sort_spec)
+        or not all(isinstance(item, list) and len(item) == 2 for item in payload["s"])
+    ):
+        raise PagingError("Invalid continuation token")
+    if [tuple(item) for item in payload["s"]] != sort_spec:
+        raise PagingError("Continuation token was issued for a different sort")
+    return payload["v"]
+
+
+def after_filter(sort_spec: SortSpec, values: list) -> Dict[str, Any]:
+    """
+    Range filter selecting documents strictly after `values` in sort order:
+    (k1 > v1) or (k1 == v1 and k2 > v2) or ... with $lt for descending keys.
+    Missing and null sort fields sort before every other value, and range
+    operators never match them, so a null position is handled explicitly.
+    """
+    clauses = []
+    for i, (field, direction) in enumerate(sort_spec):
+        clause = {prev_field: values[j] for j, (prev_field, _) in enumerate(sort_spec[:i])}
+        after = after_value(field, direction, values[i])
+        if after is None:
+            continue
+        clause.update(after)
+        clauses.append(clause)
+    return clauses[0] if len(clauses) == 1 else {"$or": clauses}
+
+
+def after_value(field: str, direction: int, value: Any) -> Optional[Dict[str, Any]]:
+    """Condition on one sort field for values after `value`, or None if there are none"""
+    if value is None:
+        # Ascending: every non-null value follows; descending: nothing does
+        return {field: {"$ne": None}} if direction == 1 else None
+    if direction == 1:
+        return {field: {"$gt": value}}
+    return {"$or": [{field: {"$lt": value}}, {field: None}]}
+
+
+def page_query(query: Dict[str, Any], sort_spec: SortSpec, token: Optional[str]) -> Dict[str, Any]:
+    """Combine the user filter with the resume position of a continuation token"""
+    if not token:
+        return query
+    resume = after_filter(sort_spec, decode_token(token, sort_spec))
+    return {"$and": [query, resume]} if query else resume
+
+
+def page_projection(projection: Optional[Dict[str, Any]], sort_spec: SortSpec):
+    """
+    Make sure an inclusion projection (or an excluded _id) still returns the
+    sort keys needed for the token. Returns (projection, fields to strip).
+    """
+    if not projection:
+        return projection, []
+    projection = dict(projection)
+    strip = []
+    inclusion = any(value not in (0, False) for key, value in projection.items() if key != "_id")
+    for field, _ in sort_spec:
+        if field == "_id":
+            if projection.get("_id") in (0, False):
+                projection.pop("_id")
+                strip.append("_id")
+        elif inclusion and field not in projection:
+            projection[field] = 1
+            strip.append(field)
+        elif not inclusion and projection.get(field) in (0, False):
+            projection.pop(field)
+            strip.append(field)
+    return projection or None, strip
+
+
+def strip_fields(doc: Dict[str, Any], fields: List[str]) -> Dict[str, Any]:
+    """Copy of doc without the given paths; doc itself keeps them for the token"""
+    doc = dict(doc)
+    for path in fields:
+        parts = path.split(".")
+        target: Any = doc
+        for part in parts[:-1]:
+            if not isinstance(target, dict) or not isinstance(target.get(part), dict):
+                target = None
+                break
+            target[part] = dict(target[part])
+            target = target[part]
+        if isinstance(target, dict):
+            target.pop(parts[-1], None)
+    return doc
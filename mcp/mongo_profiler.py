@@ -0,0 +1,260 @@
+import asyncio
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from pymongo.errors import PyMongoError
+
+RANGE_OPERATORS = {"$gt", "$gte", "$lt", "$lte", "$ne", "$nin", "$regex", "$exists", "$type", "$size", "$mod"}
+
+
+def query_shape(query: Optional[Dict[str, Any]]) -> Dict[str, List[str]]:
+    """
+    Fields of a filter split by how an index can serve them: equality
+    (plain values, $eq, $in) or range (comparisons, $regex, ...). Only the
+    top level and $and are used; $or branches are planned separately by
+    the server and are left out.
+    """
+    equality, ranges = [], []
+    for field, value in (query or {}).items():
+        if field == "$and" and isinstance(value, list):
+            for clause in value:
+                shape = query_shape(clause if isinstance(clause, dict) else {})
+                equality += [f for f in shape["equality"] if f not in equality]
+                ranges += [f for f in shape["range"] if f not in ranges]
+            continue
+        if field.startswith("$"):
+            continue
+        operators = set(value) if isinstance(value, dict) and value and all(k.startswith("$") for k in value) else set()
+        target = ranges if operators & RANGE_OPERATORS else equality
+        if field not in equality and field not in ranges:
+            target.append(field)
+    return {"equality": equality, "range": ranges}
+
+
+def suggest_index(shape: Dict[str, List[str]], sort: List[Tuple[str, int]]) -> List[Tuple[str, int]]:
+    """Index keys in Equality, Sort, Range order"""
+    keys = [(field, 1) for field in shape["equality"]]
+    keys += [(field, direction) for field, direction in sort if field not in shape["equality"]]
+    used = {field for field, _ in keys}
+    keys += [(field, 1) for field in shape["range"] if field not in used]
+    return keys
+
+
+def plan_summary(explain: Dict[str, Any]) -> Dict[str, Any]:
+    """Stages and index names of the winning plan, e.g. COLLSCAN or FETCH <- IXSCAN"""
+    planner = explain.get("queryPlanner") or {}
+    if not planner:
+        # aggregate explains nest the planner inside the $cursor stage
+        for stage in explain.get("stages") or []:
+            planner = (stage.get("$cursor") or {}).get("queryPlanner") or {}
+            if planner:
+                break
+    plan = planner.get("winningPlan") or {}
+    plan = plan.get("queryPlan", plan)
+    stages, indexes = [], []
+    pending = [plan]
+    while pending:
+        node = pending.pop()
+        if not isinstance(node, dict):
+            continue
+        if "stage" in node:
+            stages.append(node["stage"])
+        if "indexName" in node:
+            indexes.append(node["indexName"])
+        pending.extend(node.get("inputStages") or [])
+        if "inputStage" in node:
+            pending.append(node["inputStage"])
+    return {"stages": stages, "indexes": indexes, "collection_scan": "COLLSCAN" in stages}
+
+
+class QueryProfiler:
+    """
+    Times query tools and keeps recent query shapes for suggest_indexes.
+
+    Queries slower than threshold_ms are appended to a JSONL log (if
+    log_path is set) from a worker thread, before the tool returns. The
+    winning plan from a queryPlanner explain is fetched in the background
+    and appended as a second line with the same id, which supersedes the
+    first; with inline_plans (a process per tool call, which would exit
+    before a background explain finishes) it is fetched before the entry
+    is written. Past max_bytes the log is moved to <log>.1.
+    """
+
+    def __init__(
+        self,
+        client_factory: Callable[[], Any],
+        threshold_ms: float = 100.0,
+        log_path: Optional[str] = None,
+        history_size: int = 1000,
+        max_bytes: int = 10 * 1024 * 1024,
+        inline_plans: bool = False
+    ):
+        self.client_factory = client_factory
+        self.threshold_ms = threshold_ms
+        self.log_path = log_path
+        self.max_bytes = max_bytes
+        self.inline_plans = inline_plans
+        self.history: deque = deque(maxlen=history_size)
+        self._pending: set = set()
+        self._log_lock = threading.Lock()
+
+    @asynccontextmanager
+    async def measure(
+        self,
+        tool: str,
+        database_name: str,
+        collection_name: str,
+        query: Optional[Dict[str, Any]] = None,
+        sort: Optional[List[Tuple[str, int]]] = None,
+        explain_command: Optional[Dict[str, Any]] = None
+    ):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration_ms = (time.perf_counter() - start) * 1000
+            await self.record(tool, database_name, collection_name, query, sort, duration_ms, explain_command)
+
+    async def record(
+        self,
+        tool: str,
+        database_name: str,
+        collection_name: str,
+        query: Optional[Dict[str, Any]],
+        sort: Optional[List[Tuple[str, int]]],
+        duration_ms: float,
+        explain_command: Optional[Dict[str, Any]] = None
+    ) -> None:
+        entry = {
+            "id": uuid.uuid4().hex,
+            "timestamp": time.time(),
+            "tool": tool,
+            "database": database_name,
+            "collection": collection_name,
+            "shape": query_shape(query),
+            "sort": [list(item) for item in sort or [] if item[0] != "_id"],
+            "duration_ms": round(duration_ms, 2),
+            "slow": duration_ms >= self.threshold_ms,
+        }
+        self.history.append(entry)
+        if not entry["slow"]:
+            return
+        if explain_command is None:
+            explain_command = {"find": collection_name, "filter": query or {}}
+            if entry["sort"]:
+                explain_command["sort"] = dict(sort)
+        if self.inline_plans:
+            await self._add_plan(entry, explain_command)
+            return
+        if self.log_path:
+            await asyncio.to_thread(self._append, json.dumps(entry, default=str) + "\n")
+        task = asyncio.get_running_loop().create_task(self._add_plan(entry, explain_command))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def _add_plan(self, entry: Dict[str, Any], explain_command: Dict[str, Any]) -> None:
+        try:
+            explain = await self.client_factory()[entry["database"]].command(
+                {"explain": explain_command, "verbosity": "queryPlanner"}
+            )
+            entry["plan"] = plan_summary(explain)
+        except PyMongoError as e:
+            entry["plan"] = {"error": str(e)}
+        if self.log_path:
+            line = json.dumps(entry, default=str) + "\n"
+            await asyncio.to_thread(self._append, line)
+
+    def _append(self, line: str) -> None:
+        with self._log_lock:
+            try:
+                size = os.path.getsize(self.log_path)
+            except OSError:
+                size = 0
+            try:
+                if self.max_bytes and size >= self.max_bytes:
+                    os.replace(self.log_path, self.log_path + ".1")
+                with open(self.log_path, "a", encoding="utf-8") as f:
+                    f.write(line)
+            except OSError as e:
+                print(f"Cannot write slow query log {self.log_path}: {e}")
+
+    def _read_log(self, count: int) -> List[Dict[str, Any]]:
+        """The last `count` entries of the log, read backwards from its end"""
+        try:
+            with open(self.log_path, "rb") as f:
+                f.seek(0, os.SEEK_END)
+                position, data = f.tell(), b""
+                while position > 0 and data.count(b"\n") <= count:
+                    step = min(64 * 1024, position)
+                    position -= step
+                    f.seek(position)
+                    data = f.read(step) + data
+        except OSError:
+            return []
+        entries = []
+        for line in data.splitlines()[-count:]:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                continue
+        return entries
+
+    async def slow_queries(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """Most recent slow queries, from the log and this process's history"""
+        entries = {}
+        if self.log_path:
+            # Up to two lines per query (the entry, then the entry with its plan)
+            for entry in await asyncio.to_thread(self._read_log, 2 * self.history.maxlen):
+                if isinstance(entry, dict) and "id" in entry:
+                    entries[entry["id"]] = entry
+        for entry in self.history:
+            if entry["slow"]:
+                entries.setdefault(entry["id"], entry)
+        ordered = sorted(entries.values(), key=lambda entry: entry["timestamp"])
+        return ordered[-limit:]
+
+    async def recent_shapes(self) -> List[Dict[str, Any]]:
+        """Every query seen by this process plus logged slow queries, without duplicates"""
+        seen = {entry["id"] for entry in self.history}
+        logged = await self.slow_queries(self.history.maxlen)
+        return list(self.history) + [entry for entry in logged if entry["id"] not in seen]
+
+    async def suggestions(self, database_name: str, collection_name: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Group recent query shapes by their ESR index, busiest first"""
+        grouped: Dict[Tuple, Dict[str, Any]] = {}
+        for entry in await self.recent_shapes():
+            if entry["database"] != database_name:
+                continue
+            if collection_name and entry["collection"] != collection_name:
+                continue
+            keys = suggest_index(entry["shape"], [tuple(item) for item in entry["sort"]])
+            if not keys:
+                continue
+            group = grouped.setdefault((entry["collection"], tuple(keys)), {
+                "collection": entry["collection"],
+                "keys": dict(keys),
+                "queries": 0,
+                "slow_queries": 0,
+                "total_ms": 0.0,
+                "max_ms": 0.0,
+                "collection_scan": False,
+                "tools": set(),
+            })
+            group["queries"] += 1
+            group["slow_queries"] += int(entry["slow"])
+            group["total_ms"] += entry["duration_ms"]
+            group["max_ms"] = max(group["max_ms"], entry["duration_ms"])
+            group["collection_scan"] |= bool((entry.get("plan") or {}).get("collection_scan"))
+            group["tools"].add(entry["tool"])
+        suggestions = []
+        for group in grouped.values():
+            group["tools"] = sorted(group["tools"])
+            group["avg_ms"] = round(group["total_ms"] / group["queries"], 2)
+            group["total_ms"] = round(group["total_ms"], 2)
+            suggestions.append(group)
+        return sorted(suggestions, key=lambda group: group["total_ms"], reverse=True)
@@ -13,7 +13,14 @@ read_only := [
     "list_databases",
     "list_collections",
     "find_documents",
-    "count_documents"
+    "stream_documents",
+    "aggregate",
+    "fetch_more",
+    "slow_queries",
+    "suggest_indexes",
+    "list_indexes",
+    "count_documents",
+    "collection_stats"
 ]
 
 write_tools := [
@@ -23,6 +30,8 @@ write_tools := [
     "update_many_documents",
     "delete_document",
     "delete_many_documents",
+    "bulk_write",
+    "create_index",
     "create_collection",
     "drop_collection"
 ]
@@ -43,6 +52,12 @@ allow if {
     input.tool in read_only
 }
 
+# Batch authorization: the subset of input.tools this principal may use
+allowed_tools contains tool if {
+    some tool in input.tools
+    allow with input.tool as tool
+}
+
 # Viewer: cannot use any tools (denied by default)
 # No allow rule for viewer means they're denied
 
@@ -5,69 +5,87 @@ from google.oauth2.credentials import Credentials
 from google.auth.transport.requests import Request
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
+import jwt
+from utils.identity import get_identity_verifier, claims_to_user_info
 
 SCOPES = ['openid', 'profile', 'email']
 TOKEN_FILE = Path(__file__).parent.parent / ".token.json"
 
-def verify_token_integrity() -> bool:
+def _load_token_file():
+    """Return (credentials, id_token) from the token file, or (None, None)"""
     if not os.path.exists(TOKEN_FILE):
-        return False
-    
+        return None, None
+
     try:
-        creds = Credentials.from_authorized_user_file(TOKEN_FILE, SCOPES)
+        token_data = json.loads(Path(TOKEN_FILE).read_text())
+        creds = Credentials.from_authorized_user_info(token_data, SCOPES)
     except (json.JSONDecodeError, ValueError, KeyError):
-        return False
-    
-    if not creds.token:
-        return False
-    
+        return None, None
+
+    return creds, token_data.get("id_token")
+
+
+def _refresh_credentials(creds):
+    """Refresh the access/id tokens and persist them, returning the new id_token"""
+    creds.refresh(Request())
+    token_data = json.loads(creds.to_json())
+    token_data["id_token"] = creds.id_token
+
+    with open(TOKEN_FILE, 'w') as token:
+        token.write(json.dumps(token_data))
+    return creds.id_token
+
+
+def _fetch_user_info(creds):
+    """Remote userinfo lookup, only used for token files without an id_token"""
+    service = build('oauth2', 'v2', credentials=creds)
+    return service.userinfo().get().execute()
+
+
+def _resolve_user_info():
+    creds, id_token = _load_token_file()
+    if creds is None or not creds.token:
+        return None
+
+    if creds.expired and creds.refresh_token:
+        print("Token expired, attempting refresh...")
+        id_token = _refresh_credentials(creds) or id_token
+        print("Token refreshed successfully")
+
+    if not id_token:
+        return _fetch_user_info(creds)
+
+    verifier = get_identity_verifier()
     try:
-        if creds.expired and creds.refresh_token:
-            print("Token expired, attempting refresh...")
-            creds.refresh(Request())
-            
-            with open(TOKEN_FILE, 'w') as token:
-                token.write(creds.to_json())
-            print("Token refreshed successfully")
-        
-        service = build('oauth2', 'v2', credentials=creds)
-        user_info = service.userinfo().get().execute()
-        
-        if not user_info.get('id') or not user_info.get('email'):
-            return False
-        
-        print(f"Token verified for user: {user_info.get('email')}")
-        return True
-        
+        claims = verifier.verify(id_token)
+    except jwt.ExpiredSignatureError:
+        if not creds.refresh_token:
+            raise
+        claims = verifier.verify(_refresh_credentials(creds))
+
+    return claims_to_user_info(claims)
+
+
+def verify_token_integrity() -> bool:
+    try:
+        user_info = _resolve_user_info()
     except HttpError:
         return False
-    
     except Exception:
         return False
 
+    if not user_info or not user_info.get('id') or not user_info.get('email'):
+        return False
+
+    print(f"Token verified for user: {user_info.get('email')}")
+    return True
+
 def is_authenticated() -> bool:
     return verify_token_integrity()
 
 def get_authenticated_user_info():
-    if not os.path.exists(TOKEN_FILE):
-        return None
-    
     try:
-        creds = Credentials.from_authorized_user_file(TOKEN_FILE, SCOPES)
-        
-        if not creds.token:
-            return None
-        
-        if creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-            with open(TOKEN_FILE, 'w') as token:
-                token.write(creds.to_json())
-        
-        service = build('oauth2', 'v2', credentials=creds)
-        user_info = service.userinfo().get().execute()
-        
-        return user_info
-        
+        return _resolve_user_info()
     except Exception:
         return None
 
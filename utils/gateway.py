@@ -0,0 +1,358 @@
+import asyncio
+import json
+import os
+import secrets
+import time
+from typing import Dict, Optional
+import jwt
+from aiohttp import web
+from autogen_agentchat.base import TaskResult
+from autogen_core import CancellationToken
+from dotenv import load_dotenv
+from pymongo.errors import PyMongoError
+from utils.identity import email_verified, get_identity_verifier
+from utils.opa import async_authorize_tools, async_lookup_role
+from utils.runners import route_and_authorize
+from utils.tracing import METRICS_PORT, span, start_metrics_server
+
+load_dotenv()
+
+GATEWAY_HOST = os.getenv("GATEWAY_HOST", "127.0.0.1")
+GATEWAY_PORT = int(os.getenv("GATEWAY_PORT", "8080"))
+# Turns (routing, authorization and the agent run) in flight across all sessions
+GATEWAY_WORKERS = int(os.getenv("GATEWAY_WORKERS", "16"))
+# Turns a session may have waiting behind its running one (beyond: 429)
+GATEWAY_SESSION_QUEUE = int(os.getenv("GATEWAY_SESSION_QUEUE", "4"))
+# Queued plus running turns across all sessions, and open sessions (beyond: 503)
+GATEWAY_MAX_PENDING = int(os.getenv("GATEWAY_MAX_PENDING", "256"))
+GATEWAY_MAX_SESSIONS = int(os.getenv("GATEWAY_MAX_SESSIONS", "1000"))
+# Sessions without a request for this long are closed
+GATEWAY_SESSION_IDLE = float(os.getenv("GATEWAY_SESSION_IDLE", "1800"))
+# How the gateway reaches the MongoDB MCP server (see MCP_TRANSPORT)
+GATEWAY_MCP_TRANSPORT = os.getenv("GATEWAY_MCP_TRANSPORT", "inprocess")
+
+RETRY_AFTER = "1"
+
+
+class Turn:
+    """One message of a session, with the events streamed back to its request"""
+
+    def __init__(self, message: str):
+        self.message = message
+        self.events: asyncio.Queue = asyncio.Queue()
+        self.cancellation_token = CancellationToken()
+
+    def emit(self, event: str, data: dict) -> None:
+        self.events.put_nowait((event, data))
+
+    def close(self) -> None:
+        self.events.put_nowait(None)
+
+
+class Session:
+    """
+    A user's agent and conversation. Turns run one at a time in arrival
+    order, so the agent's model context stays consistent.
+    """
+
+    def __init__(self, principal, subject: str, agent, queue_size: int):
+        self.id = secrets.token_urlsafe(16)
+        self.principal = principal
+        self.subject = subject
+        self.agent = agent
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.last_active = time.monotonic()
+        self.running: Optional[Turn] = None
+        self.turns = 0
+        self.worker: Optional[asyncio.Task] = None
+
+    @property
+    def busy(self) -> bool:
+        return self.running is not None or not self.queue.empty()
+
+
+class Gateway:
+    """
+    HTTP front end serving many users at once. Each session belongs to the
+    Google identity whose id_token opened it (sent as a bearer token on
+    every request) and has its own agent, built by agent_factory(tools)
+    with only the tools OPA allows that user; the model client and tool
+    objects are shared. Turns of different sessions run concurrently, at
+    most `workers` at a time, and excess load is refused with 429 (this
+    session's queue is full) or 503 (the gateway is full) and Retry-After.
+
+        POST   /sessions                 open a session     -> {"session_id", "email", "role", "tools"}
+        POST   /sessions/{id}/messages   {"message": "..."} -> SSE events, or JSON
+        DELETE /sessions/{id}            close a session
+        GET    /health                   load and limits
+    """
+
+    def __init__(
+        self,
+        agent_factory,
+        tools: list,
+        verifier=None,
+        workers: int = GATEWAY_WORKERS,
+        session_queue: int = GATEWAY_SESSION_QUEUE,
+        max_pending: int = GATEWAY_MAX_PENDING,
+        max_sessions: int = GATEWAY_MAX_SESSIONS,
+        idle_seconds: float = GATEWAY_SESSION_IDLE,
+    ):
+        self.agent_factory = agent_factory
+        self.tools = tools
+        self.verifier = verifier
+        self.worker_count = workers
+        self.workers = asyncio.Semaphore(workers)
+        self.session_queue = session_queue
+        self.max_pending = max_pending
+        self.max_sessions = max_sessions
+        self.idle_seconds = idle_seconds
+        self.sessions: Dict[str, Session] = {}
+        self.pending = 0
+        self.running = 0
+        self.rejected = {"429": 0, "503": 0}
+        self._sweeper: Optional[asyncio.Task] = None
+
+    # --- Identity ---
+
+    async def authenticate(self, request: web.Request):
+        """(claims, (email, role)) for the request's bearer id_token"""
+        header = request.headers.get("Authorization", "")
+        if not header.startswith("Bearer "):
+            raise web.HTTPUnauthorized(text="Bearer id_token required")
+        verifier = self.verifier or get_identity_verifier()
+        try:
+            # Cached tokens are a dictionary lookup, but a JWKS fetch blocks
+            claims = await asyncio.to_thread(verifier.verify, header[len("Bearer "):].strip())
+        except jwt.InvalidTokenError as e:
+            raise web.HTTPUnauthorized(text=f"Invalid id_token: {e}")
+        email = claims.get("email")
+        if not email:
+            raise web.HTTPUnauthorized(text="id_token has no email claim")
+        if not email_verified(claims):
+            raise web.HTTPUnauthorized(text="id_token email is not verified")
+        try:
+            role = await async_lookup_role(email)
+        except PyMongoError as e:
+            print(f"Role lookup failed: {e}")
+            raise web.HTTPServiceUnavailable(text="Role lookup is unavailable", headers={"Retry-After": RETRY_AFTER})
+        if role is None:
+            raise web.HTTPForbidden(text=f"No role for {email}")
+        return claims, (email, role)
+
+    async def session_for(self, request: web.Request) -> Session:
+        session = self.sessions.get(request.match_info["session_id"])
+        if session is None:
+            raise web.HTTPNotFound(text="Unknown session")
+        claims, principal = await self.authenticate(request)
+        if claims["sub"] != session.subject:
+            raise web.HTTPForbidden(text="Session belongs to another user")
+        if principal != session.principal:
+            # The session's tools were authorized for the old role
+            await self.close_session(session)
+            raise web.HTTPForbidden(text="Role changed; open a new session")
+        session.last_active = time.monotonic()
+        return session
+
+    def overloaded(self, status: str, text: str):
+        self.rejected[status] += 1
+        error = web.HTTPTooManyRequests if status == "429" else web.HTTPServiceUnavailable
+        return error(text=text, headers={"Retry-After": RETRY_AFTER})
+
+    # --- Handlers ---
+
+    async def create_session(self, request: web.Request) -> web.Response:
+        claims, principal = await self.authenticate(request)
+        if len(self.sessions) >= self.max_sessions:
+            raise self.overloaded("503", "Too many open sessions")
+        # The agent only gets the tools this user may call; routing checks
+        # each turn's candidates again, under the current policy
+        try:
+            decisions = await async_authorize_tools(principal, [tool.name for tool in self.tools])
+        except Exception as e:
+            print(f"OPA batch check failed: {e}")
+            raise web.HTTPServiceUnavailable(text="Authorization is unavailable", headers={"Retry-After": RETRY_AFTER})
+        tools = [tool for tool in self.tools if decisions[tool.name]]
+        if not tools:
+            raise web.HTTPForbidden(text=f"Role {principal[1]} may not use any tools")
+        session = Session(principal, claims["sub"], await self.agent_factory(tools), self.session_queue)
+        session.worker = asyncio.create_task(self._session_worker(session))
+        self.sessions[session.id] = session
+        print(f"Gateway session {session.id} opened for {principal[0]} ({principal[1]}, {len(tools)} tools)")
+        return web.json_response({
+            "session_id": session.id,
+            "email": principal[0],
+            "role": principal[1],
+            "tools": [tool.name for tool in tools]
+        })
+
+    async def post_message(self, request: web.Request) -> web.StreamResponse:
+        session = await self.session_for(request)
+        try:
+            body = await request.json()
+        except json.JSONDecodeError:
+            raise web.HTTPBadRequest(text="Body must be JSON")
+        message = str(body.get("message", "")).strip() if isinstance(body, dict) else ""
+        if not message:
+            raise web.HTTPBadRequest(text="message is required")
+
+        if self.pending >= self.max_pending:
+            raise self.overloaded("503", "Gateway is at capacity")
+        turn = Turn(message)
+        try:
+            session.queue.put_nowait(turn)
+        except asyncio.QueueFull:
+            raise self.overloaded("429", "Too many messages waiting in this session")
+        self.pending += 1
+
+        if "text/event-stream" not in request.headers.get("Accept", ""):
+            events = []
+            while (item := await turn.events.get()) is not None:
+                events.append({"event": item[0], **item[1]})
+            return web.json_response({"events": events})
+
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"})
+        await response.prepare(request)
+        while (item := await turn.events.get()) is not None:
+            event, data = item
+            try:
+                await response.write(f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n".encode())
+            except ConnectionResetError:
+                # The turn still completes, so the conversation stays consistent
+                break
+        return response
+
+    async def delete_session(self, request: web.Request) -> web.Response:
+        session = await self.session_for(request)
+        await self.close_session(session)
+        return web.json_response({"closed": session.id, "turns": session.turns})
+
+    async def health(self, _request: web.Request) -> web.Response:
+        return web.json_response({
+            "sessions": len(self.sessions),
+            "running": self.running,
+            "pending": self.pending,
+            "workers": self.worker_count,
+            "max_pending": self.max_pending,
+            "max_sessions": self.max_sessions,
+            "rejected": self.rejected,
+        })
+
+    # --- Turns ---
+
+    async def _session_worker(self, session: Session) -> None:
+        while True:
+            turn = await session.queue.get()
+            session.running = turn
+            try:
+                await self._run_turn(session, turn)
+            finally:
+                session.running = None
+                session.turns += 1
+                session.last_active = time.monotonic()
+                self.pending -= 1
+                turn.close()
+
+    async def _run_turn(self, session: Session, turn: Turn) -> None:
+        async with self.workers:
+            self.running += 1
+            try:
+                with span("turn", session=session.id):
+                    reason = await route_and_authorize(turn.message, session.principal)
+                    if reason:
+                        turn.emit("blocked", {"reason": reason})
+                        return
+                    with span("agent"):
+                        async for item in session.agent.run_stream(
+                            task=turn.message, cancellation_token=turn.cancellation_token
+                        ):
+                            if isinstance(item, TaskResult):
+                                turn.emit("done", {"stop_reason": item.stop_reason})
+                            else:
+                                turn.emit("message", {
+                                    "source": item.source,
+                                    "type": getattr(item, "type", type(item).__name__),
+                                    "content": item.to_text(),
+                                })
+            except Exception as e:
+                print(f"Gateway turn failed in session {session.id}: {e}")
+                turn.emit("error", {"error": f"{type(e).__name__}: {e}"})
+            finally:
+                self.running -= 1
+
+    async def close_session(self, session: Session) -> None:
+        self.sessions.pop(session.id, None)
+        if session.running is not None:
+            session.running.cancellation_token.cancel()
+        if session.worker is not None:
+            session.worker.cancel()
+            try:
+                await session.worker
+            except asyncio.CancelledError:
+                pass
+        while not session.queue.empty():
+            turn = session.queue.get_nowait()
+            self.pending -= 1
+            turn.emit("error", {"error": "Session closed"})
+            turn.close()
+        print(f"Gateway session {session.id} closed after {session.turns} turns")
+
+    async def _sweep(self) -> None:
+        while True:
+            await asyncio.sleep(min(60.0, self.idle_seconds / 4))
+            cutoff = time.monotonic() - self.idle_seconds
+            for session in list(self.sessions.values()):
+                if session.last_active < cutoff and not session.busy:
+                    await self.close_session(session)
+
+    # --- App ---
+
+    async def _on_startup(self, _app) -> None:
+        self._sweeper = asyncio.create_task(self._sweep())
+
+    async def _on_cleanup(self, _app) -> None:
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+        for session in list(self.sessions.values()):
+            await self.close_session(session)
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/sessions", self.create_session)
+        app.router.add_post("/sessions/{session_id}/messages", self.post_message)
+        app.router.add_delete("/sessions/{session_id}", self.delete_session)
+        app.router.add_get("/health", self.health)
+        app.on_startup.append(self._on_startup)
+        app.on_cleanup.append(self._on_cleanup)
+        return app
+
+
+async def run_gateway(host: str = GATEWAY_HOST, port: int = GATEWAY_PORT) -> None:
+    """Serve the gateway until cancelled, sharing one model client and tool set"""
+    from agents.agents import close_inprocess_servers, create_mcp_agent, get_model_client, load_server_tools
+    from embeddings.tools_embedding import tool_router
+
+    model_client, mongo_tools, _ = await asyncio.gather(
+        get_model_client(),
+        load_server_tools("mongo_db.py", GATEWAY_MCP_TRANSPORT),
+        tool_router.warm_up(),
+    )
+    if METRICS_PORT:
+        await start_metrics_server()
+
+    async def agent_factory(tools):
+        return await create_mcp_agent(model_client=model_client, mongo_tools=tools)
+
+    runner = web.AppRunner(Gateway(agent_factory, mongo_tools).app())
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    print(f"Gateway on http://{host}:{port} ({GATEWAY_WORKERS} workers)")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+        await close_inprocess_servers()
+
+
+if __name__ == "__main__":
+    asyncio.run(run_gateway())
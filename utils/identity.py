@@ -0,0 +1,123 @@
+import os
+import time
+from typing import Optional
+import jwt
+from dotenv import load_dotenv
+from utils.cache import TTLCache
+from utils.tracing import span
+
+load_dotenv()
+
+GOOGLE_JWKS_URL = "https://www.googleapis.com/oauth2/v3/certs"
+GOOGLE_ISSUERS = ("https://accounts.google.com", "accounts.google.com")
+
+# How long fetched signing keys are trusted before the JWKS is re-fetched
+JWKS_LIFESPAN = int(os.getenv("JWKS_LIFESPAN", "3600"))
+
+
+class IdentityVerifier:
+    """
+    Verify Google id_tokens locally against a cached JWKS.
+
+    Verified claims are memoized per token until the token expires, so
+    repeated checks cost a dictionary lookup instead of a network call.
+    Pass key_set (a JWKS dict) to verify against local keys, e.g. in tests.
+    """
+
+    def __init__(
+        self,
+        audience: Optional[str] = None,
+        issuers=GOOGLE_ISSUERS,
+        jwks_url: str = GOOGLE_JWKS_URL,
+        key_set: Optional[dict] = None,
+        jwks_lifespan: int = JWKS_LIFESPAN,
+        leeway: int = 30,
+    ):
+        self.audience = audience or os.getenv("GOOGLE_CLIENT_ID")
+        self.issuers = list(issuers)
+        self.leeway = leeway
+        self._key_set = jwt.PyJWKSet.from_dict(key_set) if key_set else None
+        self._jwks_client = None if key_set else jwt.PyJWKClient(
+            jwks_url, cache_jwk_set=True, lifespan=jwks_lifespan
+        )
+        self._verified = TTLCache(maxsize=64, ttl=jwks_lifespan)
+
+    def _signing_key(self, id_token: str):
+        if self._key_set is not None:
+            kid = jwt.get_unverified_header(id_token).get("kid")
+            try:
+                return self._key_set[kid].key
+            except KeyError:
+                raise jwt.InvalidTokenError(f"Unknown signing key: {kid}")
+        return self._jwks_client.get_signing_key_from_jwt(id_token).key
+
+    def verify(self, id_token: str) -> dict:
+        """Return the token's claims, raising jwt.InvalidTokenError if invalid"""
+        with span("identity.verify") as verify_span:
+            claims = self._verified.get(id_token)
+            verify_span.set(cached=claims is not None)
+            if claims is not None:
+                return claims
+
+            try:
+                key = self._signing_key(id_token)
+            except jwt.PyJWKClientError as e:
+                raise jwt.InvalidTokenError(str(e))
+
+            claims = jwt.decode(
+                id_token,
+                key,
+                algorithms=["RS256"],
+                audience=self.audience,
+                issuer=self.issuers,
+                leeway=self.leeway,
+                options={"require": ["exp", "iat", "iss", "sub"]},
+            )
+
+            # Only a verified address may be trusted to name the user's role
+            if claims.get("email") and not email_verified(claims):
+                raise jwt.InvalidTokenError("id_token email is not verified")
+
+            remaining = claims["exp"] - time.time()
+            if remaining > 0:
+                self._verified.set(id_token, claims, ttl=remaining)
+            return claims
+
+
+def email_verified(claims: dict) -> bool:
+    # Google has sent the claim both as a boolean and as the string "true"
+    return claims.get("email_verified") in (True, "true")
+
+
+identity_verifier: Optional[IdentityVerifier] = None
+
+
+def get_identity_verifier() -> IdentityVerifier:
+    """Get or create the process-wide verifier"""
+    global identity_verifier
+    if identity_verifier is None:
+        identity_verifier = IdentityVerifier()
+    return identity_verifier
+
+
+def set_identity_verifier(verifier: Optional[IdentityVerifier]) -> None:
+    """Swap the process-wide verifier (None resets to the Google default)"""
+    global identity_verifier
+    identity_verifier = verifier
+
+
+def claims_to_user_info(claims: dict) -> dict:
+    """
+    Shape id_token claims like the oauth2 v2 userinfo response. An
+    unverified email is left out, so it never identifies the user.
+    """
+    verified = email_verified(claims)
+    return {
+        "id": claims.get("sub"),
+        "email": claims.get("email") if verified else None,
+        "verified_email": verified,
+        "name": claims.get("name"),
+        "given_name": claims.get("given_name"),
+        "family_name": claims.get("family_name"),
+        "picture": claims.get("picture"),
+    }
@@ -1,65 +1,292 @@
+import asyncio
 import requests
-from utils.check import is_authenticated
+from utils.check import is_authenticated, TOKEN_FILE
 from utils.check import get_authenticated_user_info
+from utils.cache import TTLCache
+from utils.opa_client import OPA_URL, get_opa_client
+from utils.policy import get_embedded_policy
+from utils.tracing import span
 from dotenv import load_dotenv
+from pathlib import Path
+from typing import Optional
 from pymongo import MongoClient
 import os
 
 load_dotenv()
 MONGO_URI = os.getenv("MONGO_URI")
+# How long a role lookup waits for a reachable MongoDB before failing
+ROLE_LOOKUP_TIMEOUT_MS = int(os.getenv("ROLE_LOOKUP_TIMEOUT_MS", "2000"))
+POLICY_FILE = Path(__file__).parent.parent / "policies" / "policy.rego"
 
-def check_with_opa(tool: str) -> bool:
+# sidecar: ask the OPA server, embedded: evaluate policy.rego in-process,
+# parity: ask the server but report any disagreement with the embedded answer
+OPA_MODE = os.getenv("OPA_MODE", "sidecar").lower()
+parity_mismatches = 0
+
+# Decision cache configuration (a size of 0 disables caching)
+OPA_CACHE_TTL = float(os.getenv("OPA_CACHE_TTL", "60"))
+OPA_CACHE_SIZE = int(os.getenv("OPA_CACHE_SIZE", "1024"))
+
+# (email, role, tool, policy revision) -> allow
+decision_cache = TTLCache(maxsize=OPA_CACHE_SIZE, ttl=OPA_CACHE_TTL)
+# token file fingerprint -> (email, role)
+principal_cache = TTLCache(maxsize=16, ttl=OPA_CACHE_TTL)
+# email -> role, for principals that do not come from the token file
+role_cache = TTLCache(maxsize=OPA_CACHE_SIZE, ttl=OPA_CACHE_TTL)
+
+mongo_client: Optional[MongoClient] = None
+
+
+def get_mongo_client() -> MongoClient:
+    """Get or create MongoDB client used for role lookups"""
+    global mongo_client
+    if mongo_client is None:
+        mongo_client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=ROLE_LOOKUP_TIMEOUT_MS)
+    return mongo_client
+
+
+def policy_revision() -> str:
+    """Identify the active policy so cached decisions die with it"""
+    revision = os.getenv("OPA_POLICY_REVISION")
+    if revision:
+        return revision
+    if OPA_MODE == "embedded":
+        return get_embedded_policy().revision
+    try:
+        return str(POLICY_FILE.stat().st_mtime_ns)
+    except OSError:
+        return ""
+
+
+def _token_fingerprint():
+    try:
+        stat = os.stat(TOKEN_FILE)
+    except OSError:
+        return None
+    return (str(TOKEN_FILE), stat.st_mtime_ns, stat.st_size)
+
+
+def lookup_role(email: str) -> Optional[str]:
+    """Fetch the user's role from the users collection (PyMongoError if unreachable)"""
+    users = get_mongo_client()["test"]["users"]
+    with span("role_lookup"):
+        user_doc = users.find_one({"email_id": email})
+    if not user_doc:
+        print(f"No user found in DB with email_id: {email}")
+        return None
+    return user_doc.get("role", "")
+
+
+async def async_lookup_role(email: str) -> Optional[str]:
+    """lookup_role() for the event loop, cached per email"""
+    role = role_cache.get(email)
+    if role is None:
+        role = await asyncio.to_thread(lookup_role, email)
+        if role is not None:
+            role_cache.set(email, role)
+    return role
+
+
+def resolve_principal():
     """
-    Send the canonical tool + user info to OPA and get allow/deny decision.
+    Return (email, role) for the stored token, or None if the user
+    is not authenticated or unknown. Cached per token file contents.
+    """
+    fingerprint = _token_fingerprint()
+    if fingerprint is None:
+        print("User not authenticated")
+        return None
+
+    principal = principal_cache.get(fingerprint)
+    if principal is not None:
+        return principal
+
+    if not is_authenticated():
+        print("User not authenticated")
+        return None
+
+    user_info = get_authenticated_user_info() or {}
+    email = user_info.get("email")
+    print(f"User email from token: {email}")
+
+    if not email:
+        print("No email found in user info")
+        return None
+
+    role = lookup_role(email)
+    if role is None:
+        return None
+    print(f"User role: {role}")
+
+    principal = (email, role)
+    principal_cache.set(fingerprint, principal)
+    return principal
+
+
+def invalidate_decisions(email: Optional[str] = None, tool: Optional[str] = None) -> int:
+    """
+    Drop cached decisions (and principals) for a user and/or tool.
+    Call after role changes or policy deployments.
+    """
+    if email is None and tool is None:
+        principal_cache.clear()
+        role_cache.clear()
+        removed = len(decision_cache)
+        decision_cache.clear()
+        return removed
+
+    if email is not None:
+        principal_cache.clear()
+        role_cache.invalidate(lambda key: key == email)
+
+    def matches(key):
+        key_email, _, key_tool, _ = key
+        return (email is None or key_email == email) and (tool is None or key_tool == tool)
+
+    return decision_cache.invalidate(matches)
+
+
+def decision_cache_stats() -> dict:
+    return decision_cache.stats()
+
+
+def _compare_with_embedded(input_data: dict, sidecar_allowed: bool) -> None:
+    global parity_mismatches
+    policy = get_embedded_policy()
+    embedded_allowed = policy.allow(input_data)
+    if embedded_allowed != sidecar_allowed:
+        parity_mismatches += 1
+        print(
+            f"Policy parity mismatch for {input_data}: sidecar={sidecar_allowed} "
+            f"embedded={embedded_allowed} ({policy.deny_reason(input_data)})"
+        )
+
+
+def query_opa_batch(input_data: dict) -> set:
+    """Ask the OPA sidecar for the allowed subset of input_data["tools"]"""
+    print(f"\nSending batch to OPA: {input_data}")
+    resp = requests.post(
+        f"{OPA_URL}/v1/data/mcp_tools/allowed_tools",
+        json={"input": input_data},
+        timeout=5
+    )
+    resp.raise_for_status()
+    return set(resp.json().get("result") or ())
+
+
+def _batch_decisions(role: str, tools: list, allowed: set) -> dict:
+    input_data = {"is_authenticated": True, "role": role}
+    decisions = {}
+    for tool in tools:
+        decisions[tool] = tool in allowed
+        if OPA_MODE == "parity":
+            _compare_with_embedded({**input_data, "tool": tool}, decisions[tool])
+    return decisions
+
+
+def decide_many(role: str, tools: list) -> dict:
+    """Evaluate allow for several tools with at most one OPA round trip"""
+    input_data = {"is_authenticated": True, "role": role, "tools": list(tools)}
+    with span("opa", mode=OPA_MODE, tools=len(tools)):
+        if OPA_MODE == "embedded":
+            allowed = get_embedded_policy().allowed_tools(input_data)
+        else:
+            allowed = query_opa_batch(input_data)
+    return _batch_decisions(role, tools, allowed)
+
+
+async def async_decide_many(role: str, tools: list) -> dict:
+    """decide_many() for the event loop, using the pooled async OPA client"""
+    input_data = {"is_authenticated": True, "role": role, "tools": list(tools)}
+    with span("opa", mode=OPA_MODE, tools=len(tools)):
+        if OPA_MODE == "embedded":
+            allowed = get_embedded_policy().allowed_tools(input_data)
+        else:
+            print(f"\nSending batch to OPA: {input_data}")
+            allowed = set(await get_opa_client().evaluate("mcp_tools/allowed_tools", input_data) or ())
+    return _batch_decisions(role, tools, allowed)
+
+
+def _split_cached(principal, tools: list):
+    """Return (cached decisions, tools still needing a decision, revision)"""
+    email, role = principal
+    revision = policy_revision()
+    decisions, missing = {}, []
+    for tool in dict.fromkeys(tools):
+        allowed = decision_cache.get((email, role, tool, revision))
+        if allowed is None:
+            missing.append(tool)
+        else:
+            decisions[tool] = allowed
+    return decisions, missing, revision
+
+
+def _store_decisions(principal, decisions: dict, revision: str) -> None:
+    email, role = principal
+    for tool, allowed in decisions.items():
+        decision_cache.set((email, role, tool, revision), allowed)
+
+
+def _print_decisions(decisions: dict) -> None:
+    summary = ", ".join(f"{tool}={'ALLOWED' if ok else 'DENIED'}" for tool, ok in decisions.items())
+    print(f"OPA Decisions: {summary}")
+
+
+def authorize_tools(principal, tools: list) -> dict:
+    """
+    Decisions for an explicit (email, role) principal, through the decision
+    cache. Raises if OPA cannot be reached; callers decide how to fail.
     """
-    mongo_client = MongoClient(MONGO_URI)
-    role = ""
+    decisions, missing, revision = _split_cached(principal, tools)
+    if missing:
+        fresh = decide_many(principal[1], missing)
+        _store_decisions(principal, fresh, revision)
+        decisions.update(fresh)
+    return {tool: decisions[tool] for tool in tools}
+
+
+async def async_authorize_tools(principal, tools: list) -> dict:
+    """authorize_tools() for the event loop, using the pooled async OPA client"""
+    decisions, missing, revision = _split_cached(principal, tools)
+    if missing:
+        fresh = await async_decide_many(principal[1], missing)
+        _store_decisions(principal, fresh, revision)
+        decisions.update(fresh)
+    return {tool: decisions[tool] for tool in tools}
+
 
+async def async_check_tools_with_opa(tools: list) -> dict:
+    """
+    Authorize a list of candidate tools for the current user in one
+    decision. Returns {tool: allowed}; every tool is denied on failure.
+    """
     try:
-        if not is_authenticated():
-            print("User not authenticated")
-            return False
+        principal = await asyncio.to_thread(resolve_principal)
+        if principal is None:
+            return {tool: False for tool in tools}
 
-        user_info = get_authenticated_user_info()
-        email = user_info.get("email")
-        print(f"User email from token: {email}")
+        decisions = await async_authorize_tools(principal, tools)
+        _print_decisions(decisions)
+        return decisions
 
-        if not email:
-            print("No email found in user info")
-            return False
+    except Exception as e:
+        print(f"OPA batch check failed: {e}")
+        return {tool: False for tool in tools}
 
-        db = mongo_client["test"]
-        users = db["users"]
-        user_doc = users.find_one({"email_id": email})
-        if not user_doc:
-            print(f"No user found in DB with email_id: {email}")
+
+def check_with_opa(tool: str) -> bool:
+    """
+    Send the canonical tool + user info to OPA and get allow/deny decision.
+    """
+    try:
+        principal = resolve_principal()
+        if principal is None:
             return False
 
-        role = user_doc.get("role", "")
-        print(f"User role: {role}")
-
-        input_data = {
-            "input": {
-                "is_authenticated": True,
-                "role": role,
-                "tool": tool
-            }
-        }
-
-        print(f"\nSending to OPA: {input_data}")
-        resp = requests.post(
-            "http://localhost:8181/v1/data/mcp_tools/allow",
-            json=input_data,
-            timeout=5
-        )
-        resp.raise_for_status()
-        decision = resp.json()
-        allowed = decision.get("result", False)
+        allowed = authorize_tools(principal, [tool])[tool]
         print(f"OPA Decision: {'ALLOWED' if allowed else 'DENIED'}")
         return allowed
 
     except Exception as e:
         print(f"OPA check failed: {e}")
         return False
-    finally:
-        mongo_client.close()
\ No newline at end of file
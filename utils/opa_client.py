@@ -0,0 +1,185 @@
+import asyncio
+import os
+import random
+import time
+from typing import Any, Optional
+import aiohttp
+from dotenv import load_dotenv
+
+load_dotenv()
+
+OPA_URL = os.getenv("OPA_URL", "http://localhost:8181")
+OPA_POOL_SIZE = int(os.getenv("OPA_POOL_SIZE", "20"))
+OPA_DEADLINE = float(os.getenv("OPA_DEADLINE", "5"))
+OPA_ATTEMPT_TIMEOUT = float(os.getenv("OPA_ATTEMPT_TIMEOUT", "2"))
+OPA_RETRIES = int(os.getenv("OPA_RETRIES", "2"))
+OPA_BREAKER_THRESHOLD = int(os.getenv("OPA_BREAKER_THRESHOLD", "5"))
+OPA_BREAKER_RESET = float(os.getenv("OPA_BREAKER_RESET", "30"))
+
+
+class OPAUnavailableError(Exception):
+    """OPA could not be reached within the deadline"""
+
+
+class CircuitOpenError(OPAUnavailableError):
+    """Calls are short-circuited after repeated OPA failures"""
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker: closed -> open -> half-open -> closed"""
+
+    def __init__(self, threshold: int = OPA_BREAKER_THRESHOLD, reset_timeout: float = OPA_BREAKER_RESET):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def before_call(self) -> None:
+        state = self.state
+        if state == "open":
+            raise CircuitOpenError("OPA circuit breaker is open")
+        if state == "half_open":
+            # Only one trial request is let through while half-open
+            if self._trial_in_flight:
+                raise CircuitOpenError("OPA circuit breaker is half-open")
+            self._trial_in_flight = True
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    def release_trial(self) -> None:
+        """Let another half-open trial through without counting this one (e.g. cancelled)"""
+        self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._trial_in_flight = False
+        if self.opened_at is not None or self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+
+
+class AsyncOPAClient:
+    """
+    Non-blocking OPA client sharing one keep-alive aiohttp session.
+
+    Every decision gets an overall deadline; transport errors and 5xx
+    responses are retried with jittered exponential backoff until the
+    deadline, and repeated failures trip a circuit breaker.
+    """
+
+    def __init__(
+        self,
+        base_url: str = OPA_URL,
+        pool_size: int = OPA_POOL_SIZE,
+        deadline: float = OPA_DEADLINE,
+        attempt_timeout: float = OPA_ATTEMPT_TIMEOUT,
+        retries: int = OPA_RETRIES,
+        backoff: float = 0.05,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.pool_size = pool_size
+        self.deadline = deadline
+        self.attempt_timeout = attempt_timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.breaker = breaker or CircuitBreaker()
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=60)
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def evaluate(self, path: str, input_data: dict, deadline: Optional[float] = None) -> Any:
+        """POST input to /v1/data/<path> and return the `result` field"""
+        self.breaker.before_call()
+
+        url = f"{self.base_url}/v1/data/{path.strip('/')}"
+        session = self._get_session()
+        give_up_at = time.monotonic() + (self.deadline if deadline is None else deadline)
+        last_error: Optional[Exception] = None
+
+        # Every exit settles the breaker, so a half-open trial is never left in flight
+        settled = False
+        try:
+            for attempt in range(self.retries + 1):
+                remaining = give_up_at - time.monotonic()
+                if remaining <= 0:
+                    break
+                timeout = aiohttp.ClientTimeout(total=min(self.attempt_timeout, remaining))
+                try:
+                    async with session.post(url, json={"input": input_data}, timeout=timeout) as resp:
+                        if resp.status >= 500:
+                            raise aiohttp.ClientResponseError(
+                                resp.request_info, resp.history, status=resp.status, message=resp.reason or ""
+                            )
+                        resp.raise_for_status()
+                        body = await resp.json()
+                    result = body.get("result")
+                    self.breaker.record_success()
+                    settled = True
+                    return result
+                except aiohttp.ClientResponseError as e:
+                    last_error = e
+                    if e.status < 500:
+                        # Client errors (bad path, bad input) will not improve on retry
+                        self.breaker.record_success()
+                        settled = True
+                        raise
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    last_error = e
+
+                if attempt < self.retries:
+                    delay = random.uniform(0, self.backoff * (2 ** attempt))
+                    await asyncio.sleep(min(delay, max(give_up_at - time.monotonic(), 0)))
+
+            self.breaker.record_failure()
+            settled = True
+            raise OPAUnavailableError(f"OPA request to {url} failed: {last_error}")
+        except Exception:
+            if not settled:
+                # Anything unexpected, e.g. a response body that is not an object
+                self.breaker.record_failure()
+                settled = True
+            raise
+        finally:
+            if not settled:
+                # Cancelled: nothing was learned about OPA
+                self.breaker.release_trial()
+
+    async def allow(self, input_data: dict, path: str = "mcp_tools/allow") -> bool:
+        """Same contract as check_with_opa: True only on an explicit allow"""
+        try:
+            return await self.evaluate(path, input_data) is True
+        except Exception as e:
+            print(f"OPA check failed: {e}")
+            return False
+
+
+opa_client: Optional[AsyncOPAClient] = None
+
+
+def get_opa_client() -> AsyncOPAClient:
+    """Get or create the shared async OPA client"""
+    global opa_client
+    if opa_client is None:
+        opa_client = AsyncOPAClient()
+    return opa_client
@@ -0,0 +1,185 @@
+import asyncio
+import hashlib
+import os
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+POLICY_FILE = Path(__file__).parent.parent / "policies" / "policy.rego"
+POLICY_RELOAD_INTERVAL = float(os.getenv("POLICY_RELOAD_INTERVAL", "1"))
+
+_ARRAY_RE = re.compile(r"^(\w+)\s*:=\s*\[(.*?)\]", re.S | re.M)
+_CONCAT_RE = re.compile(r"^(\w+)\s*:=\s*array\.concat\(\s*(\w+)\s*,\s*(\w+)\s*\)", re.M)
+_ALLOW_RE = re.compile(r"^allow\s+if\s*\{(.*?)\n\}", re.S | re.M)
+_KNOWN_ROLES_RE = re.compile(r"not\s+input\.role\s+in\s+\[(.*?)\]", re.S)
+_STRING_RE = re.compile(r'"([^"]*)"')
+
+
+class PolicyCompileError(Exception):
+    """policy.rego uses constructs the embedded evaluator does not understand"""
+
+
+class CompiledPolicy:
+    """
+    policy.rego reduced to its role -> tool tables.
+
+    The allow rules only test authentication, role equality and tool-set
+    membership, so every decision is precomputed into a set of allowed
+    (role, tool) pairs and answered with a single lookup.
+    """
+
+    def __init__(self, source: str):
+        self.revision = hashlib.sha256(source.encode("utf-8")).hexdigest()[:12]
+        tool_sets = {
+            name: tuple(_STRING_RE.findall(body)) for name, body in _ARRAY_RE.findall(source)
+        }
+        for name, left, right in _CONCAT_RE.findall(source):
+            tool_sets[name] = tool_sets.get(left, ()) + tool_sets.get(right, ())
+
+        self.role_tools: dict[str, frozenset] = {}
+        for body in _ALLOW_RE.findall(source):
+            role = re.search(r'input\.role\s*==\s*"([^"]+)"', body)
+            tools = re.search(r"input\.tool\s+in\s+(\w+)", body)
+            if not role or not tools or tools.group(1) not in tool_sets:
+                raise PolicyCompileError(f"Unsupported allow rule: {body.strip()}")
+            allowed = self.role_tools.get(role.group(1), frozenset())
+            self.role_tools[role.group(1)] = allowed | frozenset(tool_sets[tools.group(1)])
+
+        self.all_tools = frozenset(tool_sets.get("all_tools", ())) or frozenset().union(*self.role_tools.values())
+        known_roles = _KNOWN_ROLES_RE.search(source)
+        self.known_roles = frozenset(
+            _STRING_RE.findall(known_roles.group(1)) if known_roles else self.role_tools
+        )
+        self.matrix = frozenset(
+            (role, tool) for role, tools in self.role_tools.items() for tool in tools
+        )
+
+    def allow(self, input_data: dict) -> bool:
+        if input_data.get("is_authenticated") is not True:
+            return False
+        return (input_data.get("role"), input_data.get("tool")) in self.matrix
+
+    def allowed_tools(self, input_data: dict) -> set:
+        """Mirror of the allowed_tools rule for an input carrying a tools list"""
+        return {
+            tool for tool in input_data.get("tools", ())
+            if self.allow({**input_data, "tool": tool})
+        }
+
+    def deny_reason(self, input_data: dict) -> Optional[str]:
+        """Mirror of the deny_reason rules; None when the request is allowed"""
+        role = input_data.get("role")
+        tool = input_data.get("tool")
+        if not input_data.get("is_authenticated"):
+            return "User is not authenticated"
+        if self.allow(input_data):
+            return None
+        if role not in self.known_roles:
+            return f"Role '{role}' is not recognized"
+        if not self.role_tools.get(role):
+            return f"User role '{role}' has no tool access permissions"
+        if tool not in self.all_tools:
+            return f"Tool '{tool}' not found in available tools"
+        return f"Role '{role}' is not authorized to use tool '{tool}'"
+
+
+class EmbeddedPolicy:
+    """CompiledPolicy that reloads itself when the .rego file changes"""
+
+    def __init__(self, path: Path = POLICY_FILE, reload_interval: float = POLICY_RELOAD_INTERVAL):
+        self.path = Path(path)
+        self.reload_interval = reload_interval
+        self._mtime_ns: Optional[int] = None
+        self._checked_at = 0.0
+        self._compiled: Optional[CompiledPolicy] = None
+
+    @property
+    def compiled(self) -> CompiledPolicy:
+        now = time.monotonic()
+        if self._compiled is None or now - self._checked_at >= self.reload_interval:
+            self._checked_at = now
+            mtime_ns = self.path.stat().st_mtime_ns
+            if mtime_ns != self._mtime_ns:
+                compiled = CompiledPolicy(self.path.read_text(encoding="utf-8"))
+                if self._compiled is not None:
+                    print(f"Reloaded policy {self.path.name} (revision {compiled.revision})")
+                self._compiled = compiled
+                self._mtime_ns = mtime_ns
+        return self._compiled
+
+    @property
+    def revision(self) -> str:
+        return self.compiled.revision
+
+    def allow(self, input_data: dict) -> bool:
+        return self.compiled.allow(input_data)
+
+    def allowed_tools(self, input_data: dict) -> set:
+        return self.compiled.allowed_tools(input_data)
+
+    def deny_reason(self, input_data: dict) -> Optional[str]:
+        return self.compiled.deny_reason(input_data)
+
+
+embedded_policy: Optional[EmbeddedPolicy] = None
+
+
+def get_embedded_policy() -> EmbeddedPolicy:
+    """Get or create the process-wide embedded policy"""
+    global embedded_policy
+    if embedded_policy is None:
+        embedded_policy = EmbeddedPolicy()
+    return embedded_policy
+
+
+def parity_inputs(policy: CompiledPolicy) -> list[dict]:
+    """Every known role x tool pair, plus unknown/unauthenticated edge cases"""
+    roles = sorted(policy.known_roles | set(policy.role_tools)) + ["unknown_role"]
+    tools = sorted(policy.all_tools) + ["unknown_tool"]
+    inputs = [
+        {"is_authenticated": True, "role": role, "tool": tool} for role in roles for tool in tools
+    ]
+    inputs.append({"is_authenticated": False, "role": "admin", "tool": tools[0]})
+    return inputs
+
+
+async def check_parity(client=None) -> list[dict]:
+    """Compare embedded allow decisions against the OPA sidecar, returning mismatches"""
+    from utils.opa_client import get_opa_client
+
+    client = client or get_opa_client()
+    policy = get_embedded_policy().compiled
+    mismatches = []
+    for input_data in parity_inputs(policy):
+        sidecar = await client.evaluate("mcp_tools/allow", input_data) is True
+        embedded = policy.allow(input_data)
+        if sidecar != embedded:
+            mismatches.append({"input": input_data, "sidecar": sidecar, "embedded": embedded})
+    return mismatches
+
+
+if __name__ == "__main__":
+    if "--parity" in sys.argv:
+        async def _run():
+            from utils.opa_client import get_opa_client
+
+            try:
+                mismatches = await check_parity()
+            finally:
+                await get_opa_client().close()
+            for mismatch in mismatches:
+                print(f"MISMATCH {mismatch}")
+            print(f"Parity check finished with {len(mismatches)} mismatches")
+            return 1 if mismatches else 0
+
+        sys.exit(asyncio.run(_run()))
+
+    compiled = get_embedded_policy().compiled
+    print(f"Policy revision {compiled.revision}")
+    for role in sorted(compiled.known_roles):
+        print(f"- {role}: {sorted(compiled.role_tools.get(role, ()))}")
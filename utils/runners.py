@@ -1,9 +1,18 @@
+import asyncio
+import os
+from typing import Optional
 from autogen_agentchat.agents import AssistantAgent
 from autogen_core import CancellationToken
 from autogen_agentchat.ui import Console
 from utils.check import is_authenticated
-from utils.opa import check_with_opa
-from embeddings.tools_embedding import llm_embeddings, global_tool_embeddings
+from utils.opa import async_authorize_tools, async_check_tools_with_opa
+from embeddings.tools_embedding import tool_router
+from utils.tracing import span
+
+# Candidate tools authorized per turn, and how close (in cosine similarity)
+# a runner-up must be to the best match to also have to be allowed
+ROUTING_TOP_N = int(os.getenv("ROUTING_TOP_N", "3"))
+ROUTING_MARGIN = float(os.getenv("ROUTING_MARGIN", "0.02"))
 
 async def run_auth_agent(auth_agent: AssistantAgent) -> bool:
     """Run authentication agent until successful authentication"""
@@ -16,8 +25,9 @@ async def run_auth_agent(auth_agent: AssistantAgent) -> bool:
         print(f"- {tool.name}: {desc}")
     print("\nType 'authenticate' to start authentication process.\n")
 
-    while not is_authenticated():
-        user_input = input("Auth> ").strip()
+    while not await asyncio.to_thread(is_authenticated):
+        # Read in a thread so background startup tasks keep running
+        user_input = (await asyncio.to_thread(input, "Auth> ")).strip()
         if not user_input:
             continue
         
@@ -32,7 +42,7 @@ async def run_auth_agent(auth_agent: AssistantAgent) -> bool:
             )
         )
         
-        if is_authenticated():
+        if await asyncio.to_thread(is_authenticated):
             print("\nAuthentication successful!")
             return True
         else:
@@ -41,6 +51,39 @@ async def run_auth_agent(auth_agent: AssistantAgent) -> bool:
     return True
 
 
+async def route_and_authorize(user_input: str, principal=None) -> Optional[str]:
+    """
+    Route a request to its candidate tools and check them with OPA.
+    Returns None if the turn may run, otherwise why it may not. The
+    principal defaults to the one in the stored token; the gateway passes
+    each session's own (email, role).
+    """
+    try:
+        candidates = await tool_router.route(user_input, top_n=ROUTING_TOP_N)
+    except Exception as e:
+        return f"Tool routing failed: {e}"
+    if not candidates:
+        return "Could not match the request to a tool"
+
+    names = [name for name, _ in candidates]
+    with span("authorization"):
+        if principal is None:
+            decisions = await async_check_tools_with_opa(names)
+        else:
+            try:
+                decisions = await async_authorize_tools(principal, names)
+            except Exception as e:
+                print(f"OPA batch check failed: {e}")
+                decisions = {name: False for name in names}
+
+    # The best match and any near-tie with it must all be allowed
+    top_score = candidates[0][1]
+    contenders = [name for name, score in candidates if top_score - score <= ROUTING_MARGIN]
+    if not all(decisions[name] for name in contenders):
+        return "Request blocked by OPA policy"
+    return None
+
+
 async def run_mcp_agent(mcp_agent: AssistantAgent):
     """Run main MCP agent with all tools enabled"""
     print("\n=== MCP AGENT ACTIVE ===")
@@ -51,23 +94,23 @@ async def run_mcp_agent(mcp_agent: AssistantAgent):
     print("\nType 'exit' to quit.\n")
 
     while True:
-        user_input = input("Task> ").strip()
+        user_input = (await asyncio.to_thread(input, "Task> ")).strip()
         if not user_input:
             continue
         if user_input.lower() in {"exit", "quit"}:
             print("Agent stopped!")
             break
 
-        similar_tool = llm_embeddings.find_most_similar_tools(user_input, global_tool_embeddings, top_n=1)
-        tool_name = similar_tool[0][0]
+        with span("turn"):
+            reason = await route_and_authorize(user_input)
+            if reason:
+                print(reason)
+                continue
 
-        if not check_with_opa(tool=tool_name):
-            print("Request blocked by OPA policy")
-            continue
-
-        await Console(
-            mcp_agent.run_stream(
-                task=user_input,
-                cancellation_token=CancellationToken(),
-            )
-        )
\ No newline at end of file
+            with span("agent"):
+                await Console(
+                    mcp_agent.run_stream(
+                        task=user_input,
+                        cancellation_token=CancellationToken(),
+                    )
+                )
@@ -0,0 +1,92 @@
+import asyncio
+import json
+import os
+import time
+from contextlib import contextmanager
+from typing import Optional
+from dotenv import load_dotenv
+from agents.agents import create_auth_agent, create_mcp_agent, get_model_client, load_auth_tools, load_mongo_tools
+from utils.tracing import METRICS_PORT, start_metrics_server
+
+load_dotenv()
+
+# Optional JSONL file that collects one timing record per start, to track cold starts
+STARTUP_TIMINGS_FILE = os.getenv("STARTUP_TIMINGS_FILE")
+
+
+class PhaseTimer:
+    """Records (start, end) offsets of named startup phases"""
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.phases: dict[str, list] = {}
+
+    def start(self, name: str) -> None:
+        self.phases[name] = [time.perf_counter() - self.origin, None]
+
+    def stop(self, name: str) -> None:
+        self.phases[name][1] = time.perf_counter() - self.origin
+
+    @contextmanager
+    def phase(self, name: str):
+        self.start(name)
+        try:
+            yield
+        finally:
+            self.stop(name)
+
+    async def track(self, name: str, awaitable):
+        with self.phase(name):
+            return await awaitable
+
+    def as_dict(self) -> dict:
+        return {
+            name: {"start_ms": round(start * 1000, 1), "duration_ms": round((end - start) * 1000, 1)}
+            for name, (start, end) in self.phases.items() if end is not None
+        }
+
+    def report(self) -> None:
+        print("\nStartup timings:")
+        for name, timing in self.as_dict().items():
+            print(f"  {name:20s} +{timing['start_ms']:8.1f} ms  took {timing['duration_ms']:8.1f} ms")
+        if STARTUP_TIMINGS_FILE:
+            record = {"timestamp": time.time(), "phases": self.as_dict()}
+            with open(STARTUP_TIMINGS_FILE, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+
+
+class Startup:
+    """
+    Overlaps the slow parts of startup. start() launches the shared model
+    client, the MongoDB MCP tool listing and the embedding router warm-up
+    as background tasks, so they progress while the user authenticates;
+    the agent factories then only wait for whatever is still running.
+    """
+
+    def __init__(self, router=None):
+        self.timer = PhaseTimer()
+        self.router = router
+        self._model_client: Optional[asyncio.Task] = None
+        self._mongo_tools: Optional[asyncio.Task] = None
+        self._router_warm_up: Optional[asyncio.Task] = None
+        self._metrics_server: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._model_client = asyncio.create_task(self.timer.track("model_client", get_model_client()))
+        self._mongo_tools = asyncio.create_task(self.timer.track("mongo_tools", load_mongo_tools()))
+        if self.router is not None:
+            self._router_warm_up = asyncio.create_task(self.timer.track("tool_router", self.router.warm_up()))
+        if METRICS_PORT:
+            self._metrics_server = asyncio.create_task(start_metrics_server())
+
+    async def auth_agent(self):
+        with self.timer.phase("auth_agent"):
+            auth_tools, model_client = await asyncio.gather(
+                self.timer.track("auth_tools", load_auth_tools()), self._model_client
+            )
+            return await create_auth_agent(model_client=model_client, auth_tools=auth_tools)
+
+    async def mcp_agent(self):
+        with self.timer.phase("mcp_agent"):
+            mongo_tools, model_client = await asyncio.gather(self._mongo_tools, self._model_client)
+            return await create_mcp_agent(model_client=model_client, mongo_tools=mongo_tools)
@@ -0,0 +1,328 @@
+import asyncio
+import contextvars
+import json
+import os
+import secrets
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Finished spans are appended here as JSON lines (unset: no file). Past
+# TRACE_FILE_MAX_BYTES the file is moved to <file>.1, replacing the previous one
+DEFAULT_TRACE_FILE = str(Path(__file__).parent.parent / ".traces.jsonl")
+TRACE_FILE = os.getenv("TRACE_FILE", "")
+TRACE_FILE_MAX_BYTES = int(os.getenv("TRACE_FILE_MAX_BYTES", str(50 * 1024 * 1024)))
+# Serve Prometheus text metrics on this port (unset: no endpoint)
+METRICS_PORT = os.getenv("METRICS_PORT")
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+# Recent durations per span name used for the p50/p95/p99 quantiles
+TRACE_WINDOW = int(os.getenv("TRACE_WINDOW", "1024"))
+
+# Histogram bucket upper bounds, in seconds
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+QUANTILES = (0.5, 0.95, 0.99)
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """One timed operation; children inherit its trace id through the context"""
+
+    def __init__(self, name: str, parent: Optional["Span"], attributes: Dict[str, Any]):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(8)
+        self.span_id = secrets.token_hex(4)
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = attributes
+        self.start = time.time()
+        self._start = time.perf_counter()
+        self.duration = 0.0
+        self.status = "ok"
+        self.error: Optional[str] = None
+
+    def set(self, **attributes) -> None:
+        self.attributes.update(attributes)
+
+    def finish(self) -> None:
+        self.duration = time.perf_counter() - self._start
+
+    def as_dict(self) -> dict:
+        record = {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start,
+            "duration_ms": round(self.duration * 1000, 3),
+            "status": self.status,
+        }
+        if self.error:
+            record["error"] = self.error
+        if self.attributes:
+            record["attributes"] = self.attributes
+        return record
+
+
+class LatencyMetrics:
+    """Per span name: Prometheus histogram buckets plus a window for quantiles"""
+
+    def __init__(self, window: int = TRACE_WINDOW):
+        self.window = window
+        self._lock = threading.Lock()
+        self._series: Dict[str, dict] = {}
+
+    def observe(self, name: str, seconds: float, error: bool = False) -> None:
+        with self._lock:
+            series = self._series.get(name)
+            if series is None:
+                series = self._series[name] = {
+                    "buckets": [0] * len(BUCKETS),
+                    "count": 0,
+                    "sum": 0.0,
+                    "errors": 0,
+                    "recent": deque(maxlen=self.window),
+                }
+            for i, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    series["buckets"][i] += 1
+            series["count"] += 1
+            series["sum"] += seconds
+            series["errors"] += int(error)
+            series["recent"].append(seconds)
+
+    def quantiles(self, name: str) -> Dict[float, float]:
+        with self._lock:
+            recent = sorted(self._series[name]["recent"]) if name in self._series else []
+        return quantiles(recent)
+
+    def summary(self) -> Dict[str, dict]:
+        """{span name: {count, errors, p50_ms, p95_ms, p99_ms}}"""
+        result = {}
+        for name in sorted(self._series):
+            series = self._series[name]
+            q = self.quantiles(name)
+            result[name] = {
+                "count": series["count"],
+                "errors": series["errors"],
+                **{f"p{int(level * 100)}_ms": round(value * 1000, 2) for level, value in q.items()},
+            }
+        return result
+
+    def prometheus(self) -> str:
+        lines = [
+            "# HELP astra_span_duration_seconds Duration of traced operations.",
+            "# TYPE astra_span_duration_seconds histogram",
+        ]
+        with self._lock:
+            series_items = [(name, dict(series, recent=list(series["recent"]))) for name, series in sorted(self._series.items())]
+        for name, series in series_items:
+            label = name.replace("\\", "\\\\").replace('"', '\\"')
+            for bound, count in zip(BUCKETS, series["buckets"]):
+                lines.append(f'astra_span_duration_seconds_bucket{{span="{label}",le="{bound}"}} {count}')
+            lines.append(f'astra_span_duration_seconds_bucket{{span="{label}",le="+Inf"}} {series["count"]}')
+            lines.append(f'astra_span_duration_seconds_sum{{span="{label}"}} {series["sum"]}')
+            lines.append(f'astra_span_duration_seconds_count{{span="{label}"}} {series["count"]}')
+        lines += [
+            "# HELP astra_span_duration_quantile_seconds p50/p95/p99 over the most recent spans.",
+            "# TYPE astra_span_duration_quantile_seconds gauge",
+        ]
+        for name, series in series_items:
+            label = name.replace("\\", "\\\\").replace('"', '\\"')
+            for level, value in quantiles(sorted(series["recent"])).items():
+                lines.append(f'astra_span_duration_quantile_seconds{{span="{label}",quantile="{level}"}} {value}')
+        lines += [
+            "# HELP astra_span_errors_total Traced operations that raised.",
+            "# TYPE astra_span_errors_total counter",
+        ]
+        for name, series in series_items:
+            label = name.replace("\\", "\\\\").replace('"', '\\"')
+            lines.append(f'astra_span_errors_total{{span="{label}"}} {series["errors"]}')
+        return "\n".join(lines) + "\n"
+
+
+def quantiles(ordered: list) -> Dict[float, float]:
+    if not ordered:
+        return {}
+    return {level: ordered[min(len(ordered) - 1, int(level * len(ordered)))] for level in QUANTILES}
+
+
+class Tracer:
+    """Creates spans, records their latency and appends them to TRACE_FILE"""
+
+    def __init__(self, trace_file: Optional[str] = TRACE_FILE, max_bytes: int = TRACE_FILE_MAX_BYTES):
+        self.trace_file = trace_file or None
+        self.max_bytes = max_bytes
+        self.metrics = LatencyMetrics()
+        self._file = None
+        self._file_lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        span = Span(name, _current_span.get(), attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except GeneratorExit:
+            # a traced stream the caller stopped reading early
+            raise
+        except BaseException as e:
+            span.status = "cancelled" if isinstance(e, asyncio.CancelledError) else "error"
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            _current_span.reset(token)
+            self.end(span)
+
+    def start(self, name: str, **attributes) -> Span:
+        """A span under the current one that is not made current itself (for generators)"""
+        return Span(name, _current_span.get(), attributes)
+
+    def end(self, span: Span) -> None:
+        span.finish()
+        self.metrics.observe(span.name, span.duration, span.status == "error")
+        self.export(span)
+
+    def export(self, span: Span) -> None:
+        if not self.trace_file:
+            return
+        line = json.dumps(span.as_dict(), default=str) + "\n"
+        with self._file_lock:
+            if self._file is None:
+                self._file = open(self.trace_file, "a", encoding="utf-8", buffering=1)
+            elif self.max_bytes and self._file.tell() >= self.max_bytes:
+                self._file.close()
+                os.replace(self.trace_file, self.trace_file + ".1")
+                self._file = open(self.trace_file, "a", encoding="utf-8", buffering=1)
+            self._file.write(line)
+
+
+tracer = Tracer()
+
+
+def span(name: str, **attributes):
+    """Context manager timing the enclosed block as a child of the current span"""
+    return tracer.span(name, **attributes)
+
+
+def instrument_tools(tools: list) -> list:
+    """Trace every call of these autogen tools as an mcp_tool span"""
+    for tool in tools:
+        if getattr(tool, "_traced", False):
+            continue
+        run_json = tool.run_json
+
+        async def traced_run_json(args, cancellation_token, call_id=None, _run_json=run_json, _name=tool.name):
+            with tracer.span("mcp_tool", tool=_name):
+                return await _run_json(args, cancellation_token, call_id=call_id)
+
+        tool.run_json = traced_run_json
+        tool._traced = True
+    return tools
+
+
+def instrument_model_client(client):
+    """Trace create / create_stream calls of an autogen chat completion client"""
+    if getattr(client, "_traced", False):
+        return client
+    create, create_stream = client.create, client.create_stream
+
+    async def traced_create(*args, **kwargs):
+        with tracer.span("model", stream=False) as model_span:
+            result = await create(*args, **kwargs)
+            _record_usage(model_span, result)
+            return result
+
+    async def traced_create_stream(*args, **kwargs):
+        # Not made the current span: a generator's context can change between yields
+        model_span = tracer.start("model", stream=True)
+        first_chunk = True
+        try:
+            async for item in create_stream(*args, **kwargs):
+                if first_chunk:
+                    model_span.set(first_chunk_ms=round((time.perf_counter() - model_span._start) * 1000, 1))
+                    first_chunk = False
+                _record_usage(model_span, item)
+                yield item
+        except Exception as e:
+            model_span.status = "error"
+            model_span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            tracer.end(model_span)
+
+    client.create = traced_create
+    client.create_stream = traced_create_stream
+    client._traced = True
+    return client
+
+
+def _record_usage(model_span: Span, result) -> None:
+    usage = getattr(result, "usage", None)
+    if usage is not None:
+        model_span.set(prompt_tokens=usage.prompt_tokens, completion_tokens=usage.completion_tokens)
+
+
+async def start_metrics_server(port: Optional[int] = None, host: str = METRICS_HOST):
+    """Serve GET /metrics in Prometheus text format on the running event loop"""
+    from aiohttp import web
+
+    async def metrics(_request):
+        return web.Response(text=tracer.metrics.prometheus(), content_type="text/plain", charset="utf-8")
+
+    app = web.Application()
+    app.router.add_get("/metrics", metrics)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, int(port or METRICS_PORT)).start()
+    print(f"Metrics on http://{host}:{int(port or METRICS_PORT)}/metrics")
+    return runner
+
+
+def summarize(trace_file: str) -> None:
+    """Print per-span latency percentiles and the breakdown of the slowest turn in a trace file"""
+    metrics = LatencyMetrics(window=1_000_000)
+    spans = []
+    with open(trace_file, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            spans.append(record)
+            metrics.observe(record["name"], record["duration_ms"] / 1000, record["status"] == "error")
+
+    print(f"{'span':24s} {'count':>7s} {'errors':>7s} {'p50 ms':>10s} {'p95 ms':>10s} {'p99 ms':>10s}")
+    for name, row in metrics.summary().items():
+        print(
+            f"{name:24s} {row['count']:7d} {row['errors']:7d} "
+            f"{row.get('p50_ms', 0):10.2f} {row.get('p95_ms', 0):10.2f} {row.get('p99_ms', 0):10.2f}"
+        )
+
+    turns = [record for record in spans if record["name"] == "turn"]
+    if not turns:
+        return
+    slowest = max(turns, key=lambda record: record["duration_ms"])
+    print(f"\nSlowest turn: {slowest['duration_ms']:.1f} ms (trace {slowest['trace_id']})")
+    children = {}
+    for record in spans:
+        if record["trace_id"] == slowest["trace_id"]:
+            children.setdefault(record["parent_id"], []).append(record)
+
+    def show(record, depth):
+        detail = record.get("attributes", {}).get("tool", "")
+        print(f"  {'  ' * depth}{record['name']:{24 - 2 * depth}s} {record['duration_ms']:10.1f} ms  {detail}")
+        for child in sorted(children.get(record["span_id"], []), key=lambda r: r["start"]):
+            show(child, depth + 1)
+
+    show(slowest, 0)
+
+
+if __name__ == "__main__":
+    import sys
+    summarize(sys.argv[1] if len(sys.argv) > 1 else TRACE_FILE or DEFAULT_TRACE_FILE)